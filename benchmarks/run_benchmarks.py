@@ -0,0 +1,160 @@
+#benchmark suite for fitting, prediction and ROC/AUC
+#run from the repository root:  python -m benchmarks.run_benchmarks --save benchmarks/baseline.json
+#later runs:                     python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+
+# (name, conditions per experiment K, participants N)
+SIZES = {
+    "small": (5, 50),
+    "medium": (50, 100),
+    "large": (500, 500),
+    "xlarge": (5000, 1000),
+}
+
+
+def make_experiments(n_conditions, n_participants, n_trials=100, seed=0):
+    """Simulate participants whose first five conditions follow the 3PL model used by SimplifiedThreePL."""
+    rng = np.random.default_rng(seed)
+    difficulty = np.resize(np.array([2, 1, 0, -1, -2]), n_conditions)
+    experiments = []
+    for _ in range(n_participants):
+        alpha = rng.uniform(0.5, 2.5)
+        c = rng.uniform(0.1, 0.5)
+        p = c + (1 - c) / (1 + np.exp(alpha * difficulty))
+        hits = rng.binomial(n_trials, p)
+        false_alarms = rng.binomial(n_trials, 1 - p)
+        experiment = Experiment()
+        for h, f in zip(hits.tolist(), false_alarms.tolist()):
+            experiment.add_condition(SignalDetection(h, n_trials - h, f, n_trials - f))
+        experiments.append(experiment)
+    return experiments
+
+
+def measure(func, items, repeat=1):
+    """Call func on every item and return latency percentiles, throughput and peak memory."""
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            t0 = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    # Separate pass for memory so tracing does not distort the timings
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies = np.array(latencies)
+    return {
+        "calls": len(latencies),
+        "throughput_per_s": len(latencies) / total if total > 0 else float("inf"),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p90_ms": float(np.percentile(latencies, 90) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def measure_import(repeat=5):
+    """Wall-clock time for a fresh interpreter to import the package."""
+    script = ("import time; t = time.perf_counter(); "
+              "import src.SignalDetection, src.Experiment, src.SimplifiedThreePL; "
+              "print(time.perf_counter() - t)")
+    times = [float(subprocess.run([sys.executable, "-c", script], check=True,
+                                  capture_output=True, text=True).stdout)
+             for _ in range(repeat)]
+    return {"calls": repeat, "p50_ms": float(np.median(times) * 1e3), "max_ms": max(times) * 1e3}
+
+
+def _fit(experiment):
+    try:
+        SimplifiedThreePL(experiment).fit()
+    except ValueError:
+        pass
+
+
+def run(size_names):
+    results = {}
+    for name in size_names:
+        n_conditions, n_participants = SIZES[name]
+        experiments = make_experiments(n_conditions, n_participants)
+        models = [SimplifiedThreePL(experiment) for experiment in experiments]
+        parameters = [1.2, -0.5]
+        grid = (np.linspace(0, 5, 100), np.linspace(-5, 5, 100))
+        conditions = [experiment.conditions[0] for experiment in experiments]
+        results[name] = {
+            "n_conditions": n_conditions,
+            "n_participants": n_participants,
+            "SimplifiedThreePL.fit": measure(_fit, experiments),
+            "SimplifiedThreePL.predict": measure(lambda m: m.predict(parameters), models, repeat=10),
+            "SimplifiedThreePL.negative_log_likelihood":
+                measure(lambda m: m.negative_log_likelihood(parameters), models, repeat=10),
+            "SimplifiedThreePL.negative_log_likelihood_grid":
+                measure(lambda m: m.negative_log_likelihood_grid(*grid), models[:10]),
+            "Experiment.compute_auc": measure(lambda e: e.compute_auc(), experiments),
+            "SignalDetection.d_prime": measure(lambda sdt: sdt.d_prime(), conditions, repeat=10),
+        }
+        print(f"{name}: K={n_conditions} N={n_participants}")
+        for benchmark, stats in results[name].items():
+            if isinstance(stats, dict):
+                print(f"  {benchmark:45s} p50={stats['p50_ms']:9.4f} ms  p99={stats['p99_ms']:9.4f} ms  "
+                      f"{stats['throughput_per_s']:12.1f}/s  peak={stats['peak_memory_kb']:9.1f} KiB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the benchmarks whose median latency is more than tolerance slower than the baseline."""
+    regressions = []
+    for name, benchmarks in results.items():
+        for benchmark, stats in benchmarks.items():
+            reference = baseline.get("results", {}).get(name, {}).get(benchmark)
+            if not isinstance(stats, dict) or not isinstance(reference, dict):
+                continue
+            ratio = stats["p50_ms"] / reference["p50_ms"] if reference["p50_ms"] > 0 else 1.0
+            if ratio > 1 + tolerance:
+                regressions.append((name, benchmark, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fitting, prediction and ROC/AUC")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium", "large"])
+    parser.add_argument("--save", help="write results to this JSON baseline file")
+    parser.add_argument("--compare", help="compare against this JSON baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional slowdown of median latency before flagging (default 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes)
+    results["startup"] = {"import src": measure_import()}
+    print(f"startup: import src p50={results['startup']['import src']['p50_ms']:.1f} ms")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, benchmark, ratio in regressions:
+            print(f"REGRESSION {name} {benchmark}: {ratio:.2f}x baseline median latency")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
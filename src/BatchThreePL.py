@@ -0,0 +1,231 @@
+#batched fitting of many SimplifiedThreePL models with one vectorized Fisher-scoring solve
+import numpy as np
+from src.Experiment import Experiment
+
+DEFAULT_DIFFICULTY_PARAMS = np.array([2, 1, 0, -1, -2])
+# Smallest discrimination SimplifiedThreePL.predict() does not treat as the flat alpha = 0 model
+MIN_DISCRIMINATION = 1e-8
+
+
+def experiments_to_counts(experiments):
+    """
+    Stack a list of Experiments into an (N, K, 4) array of hits, misses, falseAlarms,
+    correctRejections, with each experiment's rows weighted and pooled into its K design cells.
+    """
+    if len(experiments) == 0:
+        raise ValueError("At least one experiment is required")
+    stacked = [experiment.cell_counts() for experiment in experiments]
+    if any(len(counts) != len(stacked[0]) for counts in stacked):
+        raise ValueError("All experiments must contain the same number of conditions")
+    # The likelihood is linear in the counts, so weights and pooling can be folded in
+    return np.array(stacked, dtype=float).reshape(len(stacked), len(stacked[0]), 4)
+
+
+def _as_correct_and_total(counts):
+    if isinstance(counts, (list, tuple)) and counts and isinstance(counts[0], Experiment):
+        counts = experiments_to_counts(counts)
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim != 3 or counts.shape[2] != 4:
+        raise ValueError("Counts must have shape (N, K, 4)")
+    if counts.shape[1] == 0:
+        raise ValueError("Experiments must contain at least one condition")
+    if not np.all(np.isfinite(counts)) or np.any(counts < 0):
+        raise ValueError("Counts must be non-negative and finite")
+    n_correct = counts[:, :, 0] + counts[:, :, 3]
+    n_total = counts.sum(axis=2)
+    return n_correct, n_total
+
+
+def log_probabilities(z, q):
+    """
+    Log-space pieces of p = c + (1 - c) * s with s = expit(z) and c = expit(q), broadcast
+    together: log c, log(1 - c), log s, log(1 - s), log p and log(1 - p). Neither log(p) nor
+    log(1 - p) is taken of a probability that has rounded to 0 or 1. z = -inf gives the flat
+    model p = c that SimplifiedThreePL.predict() uses at alpha = 0.
+    """
+    from scipy.special import log_expit
+    log_c, log_1mc = log_expit(q), log_expit(-q)
+    log_s, log_1ms = log_expit(z), log_expit(-z)
+    log_p = np.logaddexp(log_c, log_1mc + log_s)  # log(c + (1 - c) * s)
+    log_1mp = log_1mc + log_1ms                    # log((1 - c) * (1 - s))
+    return log_c, log_1mc, log_s, log_1ms, log_p, log_1mp
+
+
+def cell_nll(z, q, n_correct, n_incorrect):
+    """Negative log-likelihood of every cell with linear predictor z = alpha * x and logit base rate q."""
+    *_, log_p, log_1mp = log_probabilities(z, q)
+    # Empty cells contribute nothing even where their log-probability is -inf
+    return -(np.where(n_correct > 0, n_correct * log_p, 0.0) + np.where(n_incorrect > 0, n_incorrect * log_1mp, 0.0))
+
+
+def cell_derivatives(z, q, n_correct, n_incorrect, observed=False):
+    """
+    Per-cell negative log-likelihood, its gradient (d/dz, d/dq) and second-order terms
+    (zz, zq, qq): the expected (Fisher) information, or the observed second derivatives with
+    observed=True. Derivatives with respect to alpha, abilities or difficulties follow by the
+    chain rule through z = alpha * (theta - b). All terms are built from log_probabilities.
+    """
+    log_c, log_1mc, log_s, log_1ms, log_p, log_1mp = log_probabilities(z, q)
+    c, s = np.exp(log_c), np.exp(log_s)
+    # (dp/dz) / p and (dp/dq) / p; the matching ratios over 1 - p reduce to s and c
+    dz_p = np.exp(log_1mc + log_s + log_1ms - log_p)
+    dq_p = np.exp(log_c + log_1mc + log_1ms - log_p)
+    nll = -(np.where(n_correct > 0, n_correct * log_p, 0.0) + np.where(n_incorrect > 0, n_incorrect * log_1mp, 0.0))
+    d_z = -(n_correct * dz_p - n_incorrect * s)
+    d_q = -(n_correct * dq_p - n_incorrect * c)
+    if observed:
+        h_zz = n_correct * dz_p ** 2 + n_incorrect * s ** 2 + d_z * (1 - 2 * s)
+        h_zq = n_correct * dz_p * (dq_p + c)
+        h_qq = n_correct * dq_p ** 2 + n_incorrect * c ** 2 + d_q * (1 - 2 * c)
+    else:
+        n_total = n_correct + n_incorrect
+        h_zz = n_total * dz_p * s
+        h_zq = n_total * dz_p * c
+        h_qq = n_total * dq_p * c
+    return nll, (d_z, d_q), (h_zz, h_zq, h_qq)
+
+
+def nll_and_derivatives(alpha, q, x, n_correct, n_incorrect):
+    """
+    Negative log-likelihood, gradient and expected (Fisher) information with respect to
+    (alpha, q) for every row of a stack of experiments; alpha and q have one entry per row.
+    """
+    nll, (d_z, d_q), (i_zz, i_zq, i_qq) = cell_derivatives(alpha[:, None] * x, q[:, None], n_correct, n_incorrect)
+    gradient = np.stack([np.sum(d_z * x, axis=1), np.sum(d_q, axis=1)], axis=1)
+    # Expected information is positive semi-definite, unlike the observed Hessian
+    information = np.empty((len(alpha), 2, 2))
+    information[:, 0, 0] = np.sum(i_zz * x ** 2, axis=1)
+    information[:, 0, 1] = information[:, 1, 0] = np.sum(i_zq * x, axis=1)
+    information[:, 1, 1] = np.sum(i_qq, axis=1)
+    return nll.sum(axis=1), gradient, information
+
+
+def batch_nll(alpha, q, x, n_correct, n_incorrect):
+    """Negative log-likelihood of every row of a stack of experiments."""
+    return cell_nll(alpha[:, None] * x, q[:, None], n_correct, n_incorrect).sum(axis=1)
+
+
+def constant_rate_fit(n_correct, n_incorrect, eps=1e-12):
+    """
+    Closed-form fit of the flat alpha = 0 model of every row: (q, negative log-likelihood).
+    predict() returns the constant c at alpha = 0 (z = -inf), so the best such c is the overall accuracy.
+    """
+    from scipy.special import logit
+    correct, incorrect = n_correct.sum(axis=1), n_incorrect.sum(axis=1)
+    c = np.clip(np.divide(correct, correct + incorrect, out=np.full(len(correct), 0.5),
+                          where=correct + incorrect > 0), eps, 1 - eps)
+    q = logit(c)
+    return q, cell_nll(np.full(n_correct.shape, -np.inf), q[:, None], n_correct, n_incorrect).sum(axis=1)
+
+
+def fit_batch(counts, difficulty_params=None, person_param=0, initial_guess=None,
+              max_iter=100, tol=1e-8, ridge=1e-10):
+    """
+    Fit (alpha, q) for every experiment in a stack with a vectorized Fisher-scoring solver.
+
+    counts is either an (N, K, 4) array of hits, misses, falseAlarms, correctRejections
+    or a list of N Experiments with K conditions each. Returns a dict of length-N arrays.
+    As in SimplifiedThreePL.predict(), a discrimination of 0 means the constant base rate c.
+    """
+    n_correct, n_total = _as_correct_and_total(counts)
+    return fit_correct_total(n_correct, n_total, difficulty_params, person_param, initial_guess,
+                             max_iter, tol, ridge)
+
+
+def fit_correct_total(n_correct, n_total, difficulty_params=None, person_param=0, initial_guess=None,
+                      max_iter=100, tol=1e-8, ridge=1e-10):
+    """fit_batch on (N, K) arrays of correct and total trial counts, the likelihood's sufficient statistics."""
+    from scipy.special import expit
+    n_correct = np.atleast_2d(np.asarray(n_correct, dtype=float))
+    n_total = np.atleast_2d(np.asarray(n_total, dtype=float))
+    if difficulty_params is None:
+        difficulty_params = DEFAULT_DIFFICULTY_PARAMS
+    difficulty_params = np.asarray(difficulty_params, dtype=float)
+    # Conditions and difficulty params are paired up like zip() would
+    k = min(n_correct.shape[1], len(difficulty_params))
+    n_correct, n_total = n_correct[:, :k], n_total[:, :k]
+    n_incorrect = n_total - n_correct
+    x = person_param - difficulty_params[:k]
+
+    n = n_correct.shape[0]
+    if initial_guess is None:
+        initial_guess = [1.0, 0.0]
+    start = np.broadcast_to(np.asarray(initial_guess, dtype=float), (n, 2))
+    # The solver stays on the smooth branch alpha >= MIN_DISCRIMINATION; predict()'s flat
+    # alpha = 0 model is compared separately once the solve is done
+    alpha = np.maximum(start[:, 0].copy(), MIN_DISCRIMINATION)
+    q = start[:, 1].copy()
+    converged = np.zeros(n, dtype=bool)
+    # Rows whose line search found no improving step; they stop without being marked converged
+    stalled = np.zeros(n, dtype=bool)
+    n_iterations = np.zeros(n, dtype=int)
+
+    nll, gradient, information = nll_and_derivatives(alpha, q, x, n_correct, n_incorrect)
+    for _ in range(max_iter):
+        active = ~(converged | stalled)
+        if not np.any(active):
+            break
+        idx = np.flatnonzero(active)
+        n_iterations[idx] += 1
+
+        # Solve the 2x2 scoring system for every active row at once
+        info = information[idx] + ridge * np.eye(2)
+        step = -np.linalg.solve(info, gradient[idx][:, :, None])[:, :, 0]
+        # At the lower alpha bound with the gradient pushing alpha below it, alpha is held
+        # there and only q moves, with its own 1-D scoring step
+        at_bound = (alpha[idx] <= MIN_DISCRIMINATION) & (gradient[idx, 0] > 0)
+        step[at_bound, 0] = 0.0
+        step[at_bound, 1] = -gradient[idx[at_bound], 1] / info[at_bound, 1, 1]
+
+        # Backtrack until the likelihood does not get worse, keeping alpha on its bound
+        scale = np.ones(len(idx))
+        new_alpha = np.maximum(alpha[idx] + step[:, 0], MIN_DISCRIMINATION)
+        new_q = q[idx] + step[:, 1]
+        new_nll = batch_nll(new_alpha, new_q, x, n_correct[idx], n_incorrect[idx])
+        for _ in range(30):
+            worse = ~(new_nll <= nll[idx] + 1e-12)
+            if not np.any(worse):
+                break
+            scale[worse] *= 0.5
+            new_alpha[worse] = np.maximum(alpha[idx][worse] + scale[worse] * step[worse, 0], MIN_DISCRIMINATION)
+            new_q[worse] = q[idx][worse] + scale[worse] * step[worse, 1]
+            new_nll[worse] = batch_nll(new_alpha[worse], new_q[worse], x,
+                                        n_correct[idx][worse], n_incorrect[idx][worse])
+        # A step the line search rejected is never taken
+        failed = ~(new_nll <= nll[idx] + 1e-12)
+        accepted = idx[~failed]
+        stalled[idx[failed]] = True
+        new_alpha, new_q, scale = new_alpha[~failed], new_q[~failed], scale[~failed]
+
+        moved = np.maximum(np.abs(new_alpha - alpha[accepted]), np.abs(new_q - q[accepted]))
+        alpha[accepted], q[accepted] = new_alpha, new_q
+        nll_sub, gradient_sub, information_sub = nll_and_derivatives(
+            new_alpha, new_q, x, n_correct[accepted], n_incorrect[accepted])
+        nll[accepted], gradient[accepted], information[accepted] = nll_sub, gradient_sub, information_sub
+
+        # Projected gradient: a positive alpha-gradient at the lower bound is optimal.
+        # A tiny move only counts as convergence when the full step was accepted
+        projected = gradient_sub.copy()
+        projected[(new_alpha <= MIN_DISCRIMINATION) & (projected[:, 0] > 0), 0] = 0.0
+        converged[accepted] = (((moved < tol) & (scale == 1))
+                               | (np.max(np.abs(projected), axis=1) < tol * np.maximum(1.0, np.abs(nll_sub))))
+
+    # A stalled row may still sit at an optimum the tolerance was too tight to confirm
+    projected = gradient.copy()
+    projected[(alpha <= MIN_DISCRIMINATION) & (projected[:, 0] > 0), 0] = 0.0
+    converged |= stalled & (np.max(np.abs(projected), axis=1) < np.sqrt(tol) * np.maximum(1.0, np.abs(nll)))
+
+    # The flat model wins where it explains the data better than any alpha on the smooth branch
+    flat_q, flat_nll = constant_rate_fit(n_correct, n_incorrect)
+    flat = ~(flat_nll >= nll - 1e-9 * np.maximum(1.0, np.abs(nll)))
+    alpha[flat], q[flat], nll[flat] = 0.0, flat_q[flat], flat_nll[flat]
+    converged |= flat
+
+    return {
+        "discrimination": alpha,
+        "logit_base_rate": q,
+        "base_rate": expit(q),
+        "negative_log_likelihood": nll,
+        "converged": converged & np.isfinite(nll),
+        "n_iterations": n_iterations
+    }
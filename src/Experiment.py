@@ -1,54 +1,330 @@
+from collections.abc import Sequence
 from typing import List, Tuple, Optional
-from src.SignalDetection import SignalDetection
+import numpy as np
+from src.SignalDetection import SignalDetection, as_count, batch_metrics, check_counts
+
+
+class _ConditionView(Sequence):
+    """Read-only sequence of SignalDetection objects built on demand from the count columns."""
+
+    def __init__(self, experiment):
+        self._experiment = experiment
+
+    def __len__(self):
+        return self._experiment._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("condition index out of range")
+        hits, misses, false_alarms, correct_rejections = map(as_count, self._experiment._counts[index].tolist())
+        return SignalDetection._trusted(hits, misses, false_alarms, correct_rejections)
+
+
+class _LabelView(Sequence):
+    """Read-only sequence of condition labels decoded from the interned label codes."""
+
+    def __init__(self, experiment):
+        self._experiment = experiment
+
+    def __len__(self):
+        return self._experiment._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("label index out of range")
+        code = self._experiment._label_codes[index]
+        return None if code < 0 else self._experiment._label_values[code]
+
 
 class Experiment:
+    _INITIAL_CAPACITY = 8
+
     def __init__(self):
         """Initialize an empty experiment."""
-        self.conditions: List[SignalDetection] = []
-        self.labels: List[Optional[str]] = []
-        
-    def add_condition(self, sdt_obj: SignalDetection, label: str = None) -> None:
-        """Add a SignalDetection object and optional label to the experiment."""
-        self.conditions.append(sdt_obj)
-        self.labels.append(label)
+        # Columnar storage: one row of (hits, misses, falseAlarms, correctRejections) per condition
+        self._counts = np.empty((self._INITIAL_CAPACITY, 4), dtype=np.float64)
+        self._label_codes = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        # How many identical conditions each row stands for
+        self._weights = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        # Design cell (difficulty parameter) of each row; rows in the same cell pool their counts
+        self._cells = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._label_values: List[str] = []
+        self._label_index = {}
+        self._size = 0
+        # Running weighted sums of the four count columns and a counter bumped on every change
+        self._totals = np.zeros(4, dtype=np.float64)
+        self._version = 0
+        self._roc_cache = None
+
+    @classmethod
+    def _from_columns(cls, counts: np.ndarray, label_codes: np.ndarray, label_values: Sequence[str],
+                      weights: Optional[np.ndarray] = None, cells: Optional[np.ndarray] = None) -> "Experiment":
+        # Adopt existing (n, 4) count, label-code, weight and cell columns without copying them;
+        # the first add_condition reallocates, so read-only or mapped arrays are fine
+        experiment = cls.__new__(cls)
+        experiment._counts = counts
+        experiment._label_codes = label_codes
+        experiment._weights = np.ones(len(counts)) if weights is None else weights
+        experiment._cells = np.arange(len(counts)) if cells is None else cells
+        experiment._label_values = label_values
+        experiment._label_index = None
+        experiment._size = len(counts)
+        experiment._totals = experiment._weights @ counts if len(counts) else np.zeros(4)
+        experiment._version = 0
+        experiment._roc_cache = None
+        return experiment
+
+    @classmethod
+    def from_counts(cls, counts, labels: Optional[Sequence[Optional[str]]] = None,
+                    weights=None, cells=None, validate: bool = True) -> "Experiment":
+        """
+        Build an experiment from an (n, 4) array of hits, misses, falseAlarms, correctRejections
+        (any integer or float dtype) without creating a SignalDetection per condition.
+        The whole array is checked at once; validate=False skips the checks for trusted input.
+        """
+        counts = check_counts(counts) if validate else np.asarray(counts, dtype=np.float64)
+        if validate and weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            if weights.shape != (len(counts),):
+                raise ValueError("weights must have one entry per condition")
+            if not np.all(np.isfinite(weights)) or np.any(weights < 0):
+                raise ValueError("Condition weight must be a non-negative finite number.")
+        if validate and cells is not None:
+            cells = np.asarray(cells)
+            if cells.shape != (len(counts),):
+                raise ValueError("cells must have one entry per condition")
+            if len(cells) and (not np.issubdtype(cells.dtype, np.integer) or cells.min() < 0):
+                raise ValueError("Design cells must be non-negative integers.")
+        if labels is not None and len(labels) != len(counts):
+            raise ValueError("labels must have one entry per condition")
+        experiment = cls._from_columns(np.array(counts, dtype=np.float64),
+                                       np.full(len(counts), -1, dtype=np.int64), [],
+                                       None if weights is None else np.array(weights, dtype=np.float64),
+                                       None if cells is None else np.array(cells, dtype=np.int64))
+        experiment._label_index = {}
+        if labels is not None:
+            experiment._label_codes[:] = [experiment._intern_label(label) for label in labels]
+        return experiment
+
+    @property
+    def conditions(self) -> Sequence[SignalDetection]:
+        """Lazy view of the conditions as SignalDetection objects."""
+        return _ConditionView(self)
+
+    @property
+    def labels(self) -> Sequence[Optional[str]]:
+        """Lazy view of the condition labels."""
+        return _LabelView(self)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Read-only (n_conditions, 4) view of hits, misses, falseAlarms, correctRejections."""
+        view = self._counts[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def weights(self) -> np.ndarray:
+        """Read-only view of how many identical conditions each row stands for."""
+        view = self._weights[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def cells(self) -> np.ndarray:
+        """Read-only view of the design cell (difficulty parameter index) of each row."""
+        view = self._cells[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def totals(self) -> np.ndarray:
+        """Total hits, misses, falseAlarms and correctRejections across all conditions, counted by weight."""
+        return self._totals.copy()
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever a condition is added or trials are recorded."""
+        return self._version
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._counts):
+            return
+        capacity = max(capacity, 2 * len(self._counts))
+        counts = np.empty((capacity, 4), dtype=np.float64)
+        counts[:self._size] = self._counts[:self._size]
+        label_codes = np.empty(capacity, dtype=np.int64)
+        label_codes[:self._size] = self._label_codes[:self._size]
+        weights = np.empty(capacity, dtype=np.float64)
+        weights[:self._size] = self._weights[:self._size]
+        cells = np.empty(capacity, dtype=np.int64)
+        cells[:self._size] = self._cells[:self._size]
+        self._counts, self._label_codes, self._weights, self._cells = counts, label_codes, weights, cells
+
+    def _intern_label(self, label: Optional[str]) -> int:
+        if label is None:
+            return -1
+        if self._label_index is None:
+            # Label table shared with a store: take a private copy before adding to it
+            self._label_values = list(self._label_values)
+            self._label_index = {value: code for code, value in enumerate(self._label_values)}
+        code = self._label_index.get(label)
+        if code is None:
+            code = len(self._label_values)
+            self._label_index[label] = code
+            self._label_values.append(label)
+        return code
+
+    def add_condition(self, sdt_obj: SignalDetection, label: str = None, weight: float = 1.0,
+                      cell: Optional[int] = None) -> None:
+        """
+        Add a SignalDetection object and optional label to the experiment.
+        weight is the number of identical conditions the row stands for, and cell the design
+        cell (difficulty parameter) it belongs to, by default its own position.
+        """
+        if not (weight >= 0 and np.isfinite(weight)):
+            raise ValueError("Condition weight must be a non-negative finite number.")
+        if cell is None:
+            cell = self._size
+        elif not (isinstance(cell, (int, np.integer)) and cell >= 0):
+            raise ValueError("Design cell must be a non-negative integer.")
+        self._reserve(self._size + 1)
+        self._counts[self._size] = (sdt_obj.hits, sdt_obj.misses, sdt_obj.falseAlarms, sdt_obj.correctRejections)
+        self._label_codes[self._size] = self._intern_label(label)
+        self._weights[self._size] = weight
+        self._cells[self._size] = cell
+        self._totals += weight * self._counts[self._size]
+        self._size += 1
+        self._version += 1
+
+    def cell_counts(self) -> np.ndarray:
+        """
+        (n_cells, 4) weighted hits, misses, falseAlarms, correctRejections pooled per design
+        cell, where n_cells is one more than the largest cell; this is what models pair with
+        their difficulty parameters.
+        """
+        cells = self._cells[:self._size]
+        n_cells = int(cells.max()) + 1 if self._size else 0
+        weighted = self._weights[:self._size, None] * self._counts[:self._size]
+        if self._size and n_cells == self._size and np.array_equal(cells, np.arange(n_cells)):
+            return weighted
+        pooled = np.zeros((n_cells, 4))
+        np.add.at(pooled, cells, weighted)
+        return pooled
+
+    def collapse_duplicates(self) -> "Experiment":
+        """
+        New experiment with one row per distinct (counts, label, cell), in order of first
+        appearance, whose weight is the summed weight of the rows it replaces. Rows keep their
+        design cell, so every cell pools the same counts as before.
+        """
+        keys = np.column_stack([self._counts[:self._size], self._label_codes[:self._size],
+                                self._cells[:self._size]])
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        weights = np.bincount(inverse, weights=self._weights[:self._size], minlength=len(first))
+        order = np.argsort(first)
+        collapsed = Experiment._from_columns(self._counts[first[order]].copy(),
+                                             self._label_codes[first[order]].copy(),
+                                             self._label_values, weights[order],
+                                             self._cells[first[order]].copy())
+        return collapsed
+
+    def record_trials(self, condition, signal_present, response) -> None:
+        """
+        Add trial outcomes to existing conditions in place.
+
+        Accepts a single trial (condition index, stimulus present, responded "yes")
+        or equal-length arrays of them.
+        """
+        condition = np.asarray(condition)
+        signal_present = np.asarray(signal_present, dtype=bool)
+        response = np.asarray(response, dtype=bool)
+        if not condition.shape == signal_present.shape == response.shape:
+            raise ValueError("condition, signal_present and response must have the same shape")
+        if condition.size == 0:
+            return
+        if not np.issubdtype(condition.dtype, np.integer):
+            raise ValueError("Condition ids must be integers")
+        if condition.min() < 0 or condition.max() >= self._size:
+            raise ValueError("Condition id does not refer to an existing condition")
+        # Column 0..3 = hits, misses, falseAlarms, correctRejections
+        column = np.where(signal_present, 0, 2) + ~response
+        if condition.ndim == 0:
+            self._counts[condition, column] += 1
+            self._totals[column] += self._weights[condition]
+        else:
+            np.add.at(self._counts, (condition.ravel(), column.ravel()), 1)
+            self._totals += np.bincount(column.ravel(), weights=self._weights[condition.ravel()], minlength=4)
+        self._version += 1
+
+    def hit_rates(self) -> np.ndarray:
+        """Hit rate of every condition, 0.5 where a condition has no signal trials."""
+        hits, misses = self._counts[:self._size, 0], self._counts[:self._size, 1]
+        n_signal = hits + misses
+        return np.divide(hits, n_signal, out=np.full(self._size, 0.5), where=n_signal > 0)
+
+    def false_alarm_rates(self) -> np.ndarray:
+        """False alarm rate of every condition, 0.5 where a condition has no noise trials."""
+        false_alarms, correct_rejections = self._counts[:self._size, 2], self._counts[:self._size, 3]
+        n_noise = false_alarms + correct_rejections
+        return np.divide(false_alarms, n_noise, out=np.full(self._size, 0.5), where=n_noise > 0)
+
+    def signal_detection_metrics(self, lower: float = 0.01, upper: float = 0.99) -> dict:
+        """Hit/false alarm rates, d', criterion and beta arrays for all conditions."""
+        return batch_metrics(self._counts[:self._size], lower, upper)
         
+    def _roc_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Sorted ROC points are cached until the next add_condition/record_trials
+        if self._roc_cache is None or self._roc_cache[0] != self._version:
+            # Conditions without trials (or with zero weight) have no operating point
+            observed = (self._counts[:self._size].sum(axis=1) > 0) & (self._weights[:self._size] > 0)
+            if not np.any(observed):
+                raise ValueError("No conditions with trials available in the experiment")
+            hit_rates = self.hit_rates()[observed]
+            false_alarm_rates = self.false_alarm_rates()[observed]
+            # Sort based on false alarm rates, ties broken by hit rate
+            order = np.lexsort((hit_rates, false_alarm_rates))
+            self._roc_cache = (self._version, false_alarm_rates[order], hit_rates[order], None)
+        return self._roc_cache[1], self._roc_cache[2]
+
     def sorted_roc_points(self) -> Tuple[List[float], List[float]]:
         """Return sorted false alarm rates and corresponding hit rates."""
-        if not self.conditions:
+        if self._size == 0:
             raise ValueError("No conditions available in the experiment")
             
-        # Calculate hit rates and false alarm rates for all conditions
-        hit_rates = [sdt.hit_rate() for sdt in self.conditions]
-        false_alarm_rates = [sdt.false_alarm_rate() for sdt in self.conditions]
-        
-        # Sort based on false alarm rates
-        sorted_pairs = sorted(zip(false_alarm_rates, hit_rates))
-        sorted_fars, sorted_hrs = zip(*sorted_pairs)
-        
-        return list(sorted_fars), list(sorted_hrs)
+        sorted_fars, sorted_hrs = self._roc_arrays()
+        return sorted_fars.tolist(), sorted_hrs.tolist()
         
     def compute_auc(self) -> float:
         """Compute the Area Under the Curve using the trapezoidal rule."""
-        if not self.conditions:
+        if self._size == 0:
             raise ValueError("No conditions available in the experiment")
             
-        false_alarm_rates, hit_rates = self.sorted_roc_points()
+        false_alarm_rates, hit_rates = self._roc_arrays()
+        auc = self._roc_cache[3]
+        if auc is not None:
+            return auc
         
         # Add implicit points (0,0) and (1,1) if they don't exist
         if false_alarm_rates[0] != 0:
-            false_alarm_rates = [0.0] + false_alarm_rates
-            hit_rates = [0.0] + hit_rates
+            false_alarm_rates = np.concatenate(([0.0], false_alarm_rates))
+            hit_rates = np.concatenate(([0.0], hit_rates))
         if false_alarm_rates[-1] != 1:
-            false_alarm_rates = false_alarm_rates + [1.0]
-            hit_rates = hit_rates + [1.0]
+            false_alarm_rates = np.concatenate((false_alarm_rates, [1.0]))
+            hit_rates = np.concatenate((hit_rates, [1.0]))
             
         # Compute AUC using the trapezoidal rule
-        auc = 0.0
-        for i in range(len(false_alarm_rates) - 1):
-            width = false_alarm_rates[i + 1] - false_alarm_rates[i]
-            height = (hit_rates[i] + hit_rates[i + 1]) / 2
-            auc += width * height
-            
+        auc = float(np.trapezoid(hit_rates, false_alarm_rates))
+        self._roc_cache = self._roc_cache[:3] + (auc,)
         return auc
         
     def plot_roc_curve(self, show_plot: bool = True) -> None:
@@ -0,0 +1,196 @@
+#memory-mapped binary storage for many experiments and their fitted parameters
+import json
+import os
+import numpy as np
+from src.Experiment import Experiment
+
+FORMAT_NAME = "sdt-experiment-store"
+FORMAT_VERSION = 1
+
+# Array files inside a store directory, all little-endian and contiguous:
+#   counts.f8         (n_conditions, 4)   hits, misses, falseAlarms, correctRejections of every condition
+#   label_codes.i8    (n_conditions,)     index into the label table, -1 for no label
+#   weights.f8        (n_conditions,)     how many identical conditions each row stands for
+#   cells.i8          (n_conditions,)     design cell (difficulty parameter) of each row
+#   offsets.i8        (n_participants+1,) first condition row of every participant
+#   parameters.f8     (n_participants, 2) fitted (alpha, logit c), NaN until set
+#   labels.bin        utf-8 label table, sliced by label_offsets.i8 (n_labels+1,)
+_ARRAYS = {
+    "counts": ("counts.f8", "<f8", 4),
+    "label_codes": ("label_codes.i8", "<i8", None),
+    "weights": ("weights.f8", "<f8", None),
+    "cells": ("cells.i8", "<i8", None),
+    "offsets": ("offsets.i8", "<i8", None),
+    "parameters": ("parameters.f8", "<f8", 2),
+    "label_offsets": ("label_offsets.i8", "<i8", None),
+}
+
+
+class ExperimentStore:
+    """
+    Directory of flat binary arrays holding the counts, labels and fitted parameters of
+    many participants. Opening maps the files with np.memmap, so it does not depend on
+    the amount of data, and experiment(i) is a zero-copy view of participant i.
+    New participants are appended to the end of each file; existing data is never rewritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        header_path = os.path.join(path, "header.json")
+        if not os.path.exists(header_path):
+            raise ValueError(f"No experiment store at {path}")
+        self._open()
+
+    @classmethod
+    def create(cls, path, experiments=(), parameters=None):
+        """Create a new store at path, optionally filled with experiments."""
+        os.makedirs(path, exist_ok=False)
+        for filename, _, _ in _ARRAYS.values():
+            open(os.path.join(path, filename), "wb").close()
+        open(os.path.join(path, "labels.bin"), "wb").close()
+        np.zeros(1, dtype="<i8").tofile(os.path.join(path, "offsets.i8"))
+        np.zeros(1, dtype="<i8").tofile(os.path.join(path, "label_offsets.i8"))
+        cls._write_header(path, {"n_participants": 0, "n_conditions": 0, "n_labels": 0})
+        store = cls(path)
+        if len(experiments):
+            store.append(experiments, parameters)
+        return store
+
+    @staticmethod
+    def _write_header(path, sizes):
+        header = {"format": FORMAT_NAME, "version": FORMAT_VERSION, **sizes}
+        tmp_path = os.path.join(path, "header.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(header, f)
+        # The header is replaced last, so readers only ever see fully written rows
+        os.replace(tmp_path, os.path.join(path, "header.json"))
+
+    def _map(self, name, length):
+        filename, dtype, width = _ARRAYS[name]
+        shape = (length,) if width is None else (length, width)
+        if length == 0:
+            return np.empty(shape, dtype=dtype)
+        # Copy-on-write: experiments may record trials without touching the file
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="c", shape=shape)
+
+    def _open(self):
+        with open(os.path.join(self.path, "header.json")) as f:
+            header = json.load(f)
+        if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported experiment store format in {self.path}")
+        self._sizes = {key: header[key] for key in ("n_participants", "n_conditions", "n_labels")}
+        self._counts = self._map("counts", self._sizes["n_conditions"])
+        self._label_codes = self._map("label_codes", self._sizes["n_conditions"])
+        self._weights = self._map("weights", self._sizes["n_conditions"])
+        self._cells = self._map("cells", self._sizes["n_conditions"])
+        self._offsets = self._map("offsets", self._sizes["n_participants"] + 1)
+        self._parameters = self._map("parameters", self._sizes["n_participants"])
+        self._label_offsets = self._map("label_offsets", self._sizes["n_labels"] + 1)
+        self._label_values = None
+
+    def __len__(self):
+        return self._sizes["n_participants"]
+
+    def _check_index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("participant index out of range")
+        return index
+
+    @property
+    def label_values(self):
+        """The store-wide label table, decoded on first use."""
+        if self._label_values is None:
+            raw = np.fromfile(os.path.join(self.path, "labels.bin"), dtype=np.uint8,
+                              count=int(self._label_offsets[-1]))
+            data = raw.tobytes()
+            self._label_values = [data[start:stop].decode("utf-8")
+                                  for start, stop in zip(self._label_offsets[:-1], self._label_offsets[1:])]
+        return self._label_values
+
+    def counts(self, index):
+        """(K, 4) view of the counts of one participant."""
+        index = self._check_index(index)
+        return self._counts[self._offsets[index]:self._offsets[index + 1]]
+
+    def experiment(self, index):
+        """Experiment backed directly by the mapped arrays of one participant."""
+        index = self._check_index(index)
+        start, stop = self._offsets[index], self._offsets[index + 1]
+        return Experiment._from_columns(self._counts[start:stop], self._label_codes[start:stop], self.label_values,
+                                        self._weights[start:stop], self._cells[start:stop])
+
+    @property
+    def parameters(self):
+        """(n_participants, 2) array of stored (alpha, logit c); NaN where nothing was stored."""
+        return self._parameters
+
+    def set_parameters(self, index, discrimination, logit_base_rate):
+        """Write fitted parameters for one participant in place."""
+        index = self._check_index(index)
+        _, dtype, _ = _ARRAYS["parameters"]
+        with open(os.path.join(self.path, "parameters.f8"), "r+b") as f:
+            f.seek(index * 2 * np.dtype(dtype).itemsize)
+            np.array([discrimination, logit_base_rate], dtype=dtype).tofile(f)
+        self._parameters[index] = (discrimination, logit_base_rate)
+
+    def _append_bytes(self, filename, committed, data):
+        with open(os.path.join(self.path, filename), "r+b") as f:
+            f.truncate(committed)
+            f.seek(committed)
+            f.write(data)
+
+    def append(self, experiments, parameters=None):
+        """Append experiments (and optionally their (alpha, logit c) rows) to the end of the store."""
+        experiments = list(experiments)
+        if parameters is None:
+            parameters = np.full((len(experiments), 2), np.nan)
+        parameters = np.asarray(parameters, dtype="<f8").reshape(-1, 2)
+        if len(parameters) != len(experiments):
+            raise ValueError("parameters must have one (alpha, logit c) row per experiment")
+
+        labels = list(self.label_values)
+        label_index = {label: code for code, label in enumerate(labels)}
+        new_labels = []
+        counts, label_codes, weights, cells, offsets = [], [], [], [], []
+        end = self._sizes["n_conditions"]
+        for experiment in experiments:
+            counts.append(np.asarray(experiment.counts, dtype="<f8"))
+            weights.append(np.asarray(experiment.weights, dtype="<f8"))
+            cells.append(np.asarray(experiment.cells, dtype="<i8"))
+            codes = np.empty(len(experiment.counts), dtype="<i8")
+            for i, label in enumerate(experiment.labels):
+                if label is None:
+                    codes[i] = -1
+                    continue
+                if label not in label_index:
+                    label_index[label] = len(labels)
+                    labels.append(label)
+                    new_labels.append(label)
+                codes[i] = label_index[label]
+            label_codes.append(codes)
+            end += len(codes)
+            offsets.append(end)
+
+        encoded = [label.encode("utf-8") for label in new_labels]
+        label_end = int(self._label_offsets[-1]) + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        blocks = [
+            ("counts.f8", self._counts, np.concatenate(counts) if counts else np.empty((0, 4), dtype="<f8")),
+            ("label_codes.i8", self._label_codes,
+             np.concatenate(label_codes) if label_codes else np.empty(0, dtype="<i8")),
+            ("weights.f8", self._weights, np.concatenate(weights) if weights else np.empty(0, dtype="<f8")),
+            ("cells.i8", self._cells, np.concatenate(cells) if cells else np.empty(0, dtype="<i8")),
+            ("offsets.i8", self._offsets, np.asarray(offsets, dtype="<i8")),
+            ("parameters.f8", self._parameters, parameters),
+            ("label_offsets.i8", self._label_offsets, label_end.astype("<i8")),
+        ]
+        # Cut off anything past the committed length (e.g. an interrupted append) before writing
+        for filename, committed, block in blocks:
+            self._append_bytes(filename, committed.nbytes, np.ascontiguousarray(block).tobytes())
+        self._append_bytes("labels.bin", int(self._label_offsets[-1]), b"".join(encoded))
+
+        self._write_header(self.path, {"n_participants": self._sizes["n_participants"] + len(experiments),
+                                       "n_conditions": end,
+                                       "n_labels": len(labels)})
+        self._open()
@@ -0,0 +1,189 @@
+#asyncio front end that micro-batches concurrent fit requests into vectorized fit_batch solves
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from src.Experiment import Experiment
+from src.BatchThreePL import fit_batch
+
+
+class ServiceOverloaded(RuntimeError):
+    """Raised when a request cannot be queued within its timeout because the service is at max_pending."""
+
+
+class FitService:
+    """
+    Collects fit requests arriving within `window` seconds (up to max_batch_size of them) and
+    fits each micro-batch with a single fit_batch call in an executor, so the event loop is
+    never blocked by the CPU-bound solve. At most max_pending requests may wait in the queue;
+    further callers wait for space (or get ServiceOverloaded after their timeout).
+    """
+
+    def __init__(self, window=0.005, max_batch_size=1024, max_pending=10000, executor=None, **fit_options):
+        if window < 0:
+            raise ValueError("window must be non-negative")
+        if max_batch_size < 1 or max_pending < 1:
+            raise ValueError("max_batch_size and max_pending must be at least 1")
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.fit_options = fit_options
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._metrics = {
+            "requests": 0,
+            "rejected": 0,
+            "batches": 0,
+            "fitted": 0,
+            "failed_batches": 0,
+            "largest_batch": 0,
+            "fit_seconds": 0.0,
+        }
+
+    @property
+    def metrics(self):
+        """Counters since the service started, plus the current queue depth."""
+        metrics = dict(self._metrics)
+        metrics["pending"] = self._queue.qsize() if self._queue is not None else 0
+        metrics["mean_batch_size"] = metrics["fitted"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
+
+    async def start(self):
+        if self._worker is None:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._loop = asyncio.get_running_loop()
+            self._worker = self._loop.create_task(self._run())
+
+    async def close(self):
+        """Finish queued requests, then stop the batching task and any executor the service created."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        worker = self._worker
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def fit_async(self, experiment, timeout=None):
+        """
+        Fit one Experiment (or (K, 4) count array) and return a dict with discrimination,
+        base_rate, logit_base_rate, negative_log_likelihood, converged and n_iterations.
+        """
+        await self.start()
+        if isinstance(experiment, Experiment):
+            counts = experiment.cell_counts()
+        else:
+            counts = np.array(experiment, dtype=float)
+        if counts.ndim != 2 or counts.shape[1] != 4 or len(counts) == 0:
+            raise ValueError("Counts must have shape (K, 4) with at least one condition")
+        # Checked here rather than in the batch, so one bad request cannot fail the others
+        if not np.all(np.isfinite(counts)) or np.any(counts < 0):
+            raise ValueError("Counts must be non-negative and finite")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((counts, future)), timeout)
+        except asyncio.TimeoutError:
+            self._metrics["rejected"] += 1
+            raise ServiceOverloaded("Fit queue is full") from None
+        self._metrics["requests"] += 1
+        return await future
+
+    async def _collect(self):
+        # Wait for one request, then keep collecting until the window closes or the batch is full
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _release(self):
+        # The worker has stopped, either through close() or because its event loop shut down
+        self._worker = None
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if _default_services.get(self._loop) is self:
+            del _default_services[self._loop]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await self._serve(loop)
+        finally:
+            self._release()
+
+    async def _serve(self, loop):
+        while True:
+            batch = await self._collect()
+            try:
+                # fit_batch needs equal condition counts, so solve each shape separately
+                groups = {}
+                for counts, future in batch:
+                    groups.setdefault(counts.shape, []).append((counts, future))
+                for requests in groups.values():
+                    stacked = np.stack([counts for counts, _ in requests])
+                    start = time.perf_counter()
+                    try:
+                        result = await loop.run_in_executor(self._executor,
+                                                            partial(fit_batch, stacked, **self.fit_options))
+                    except Exception as error:
+                        self._metrics["failed_batches"] += 1
+                        for _, future in requests:
+                            if not future.done():
+                                future.set_exception(error)
+                        continue
+                    self._metrics["fit_seconds"] += time.perf_counter() - start
+                    self._metrics["batches"] += 1
+                    self._metrics["fitted"] += len(requests)
+                    self._metrics["largest_batch"] = max(self._metrics["largest_batch"], len(requests))
+                    for i, (_, future) in enumerate(requests):
+                        if not future.done():
+                            future.set_result({key: value[i].item() for key, value in result.items()})
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_default_services = {}
+
+
+async def fit_async(experiment, timeout=None):
+    """
+    Fit an experiment through a default FitService bound to the running event loop.
+
+    The service stops, and shuts its executor down, when the loop cancels its remaining tasks
+    on shutdown (as asyncio.run does); services of loops closed without that are dropped here.
+    """
+    loop = asyncio.get_running_loop()
+    for closed in [other for other in _default_services if other.is_closed()]:
+        _default_services.pop(closed)._release()
+    service = _default_services.get(loop)
+    if service is None:
+        service = _default_services[loop] = FitService()
+    return await service.fit_async(experiment, timeout=timeout)
@@ -0,0 +1,207 @@
+#joint estimation of person abilities and item difficulties for the simplified 3PL model
+import numpy as np
+from scipy.special import expit
+from src.Experiment import Experiment
+from src.BatchThreePL import experiments_to_counts, cell_nll, cell_derivatives
+
+
+class JointThreePL:
+    """
+    Simplified 3PL model p = c + (1 - c) / (1 + exp(-alpha * (theta_i - b_j))) with a shared
+    discrimination alpha and base rate c, one ability theta_i per person and one difficulty
+    b_j per item (condition), fitted by joint maximum likelihood.
+
+    Only observed person x item cells are stored (as coordinate arrays), and every pass over
+    them runs in blocks of chunk_size cells, so memory stays bounded for large designs.
+    """
+
+    def __init__(self, counts, chunk_size=1_000_000):
+        """counts is an (N, K, 4) array of hits, misses, falseAlarms, correctRejections or a list of Experiments."""
+        if isinstance(counts, (list, tuple)) and counts and isinstance(counts[0], Experiment):
+            counts = experiments_to_counts(counts)
+        counts = np.asarray(counts, dtype=float)
+        if counts.ndim != 3 or counts.shape[2] != 4:
+            raise ValueError("Counts must have shape (N, K, 4)")
+        n_correct = counts[:, :, 0] + counts[:, :, 3]
+        n_total = counts.sum(axis=2)
+        persons, items = np.nonzero(n_total > 0)
+        self._setup(persons, items, n_correct[persons, items], n_total[persons, items],
+                    counts.shape[0], counts.shape[1], chunk_size)
+
+    @classmethod
+    def from_cells(cls, persons, items, n_correct, n_total, n_persons=None, n_items=None, chunk_size=1_000_000):
+        """Build the model from coordinate arrays of observed cells, without a dense matrix."""
+        model = cls.__new__(cls)
+        persons = np.asarray(persons)
+        items = np.asarray(items)
+        n_persons = int(persons.max()) + 1 if n_persons is None else n_persons
+        n_items = int(items.max()) + 1 if n_items is None else n_items
+        model._setup(persons, items, np.asarray(n_correct, dtype=float), np.asarray(n_total, dtype=float),
+                     n_persons, n_items, chunk_size)
+        return model
+
+    def _setup(self, persons, items, n_correct, n_total, n_persons, n_items, chunk_size):
+        if not len(persons) == len(items) == len(n_correct) == len(n_total):
+            raise ValueError("Cell arrays must have the same length")
+        if len(persons) == 0:
+            raise ValueError("At least one observed cell is required")
+        if np.any(n_correct < 0) or np.any(n_correct > n_total) or not np.all(np.isfinite(n_total)):
+            raise ValueError("Cell counts must satisfy 0 <= n_correct <= n_total")
+        if persons.min() < 0 or persons.max() >= n_persons or items.min() < 0 or items.max() >= n_items:
+            raise ValueError("Cell indices out of range")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self._persons = persons.astype(np.int32 if n_persons < 2 ** 31 else np.int64)
+        self._items = items.astype(np.int32 if n_items < 2 ** 31 else np.int64)
+        self._n_correct = n_correct
+        self._n_total = n_total
+        self.n_persons = n_persons
+        self.n_items = n_items
+        self.chunk_size = chunk_size
+        self._discrimination = None
+        self._logit_base_rate = None
+        self._abilities = None
+        self._difficulties = None
+        self._is_fitted = False
+
+    def _chunks(self):
+        for start in range(0, len(self._persons), self.chunk_size):
+            yield slice(start, min(start + self.chunk_size, len(self._persons)))
+
+    def _cells(self, chunk, theta, b):
+        # x = theta_i - b_j and the correct/incorrect counts of one block of observed cells
+        x = theta[self._persons[chunk]] - b[self._items[chunk]]
+        n_correct = self._n_correct[chunk]
+        return x, n_correct, self._n_total[chunk] - n_correct
+
+    def _nll(self, alpha, q, theta, b, by=None):
+        # Total negative log-likelihood, or per-person/per-item sums when by is "persons"/"items"
+        total = 0.0 if by is None else np.zeros(self.n_persons if by == "persons" else self.n_items)
+        for chunk in self._chunks():
+            x, n_correct, n_incorrect = self._cells(chunk, theta, b)
+            terms = cell_nll(alpha * x, q, n_correct, n_incorrect)
+            if by is None:
+                total += terms.sum()
+            else:
+                index = self._persons[chunk] if by == "persons" else self._items[chunk]
+                total += np.bincount(index, terms, minlength=len(total))
+        return total
+
+    def negative_log_likelihood(self, discrimination, logit_base_rate, abilities, difficulties):
+        """Negative log-likelihood of all observed cells, the joint analogue of SimplifiedThreePL's."""
+        return self._nll(discrimination, logit_base_rate, np.asarray(abilities, dtype=float),
+                         np.asarray(difficulties, dtype=float))
+
+    def _score_block(self, alpha, q, theta, b, by):
+        # Gradient and Fisher information of every theta_i (by="persons") or b_j (by="items");
+        # z = alpha * (theta_i - b_j), so dz/dtheta_i = alpha and dz/db_j = -alpha
+        size = self.n_persons if by == "persons" else self.n_items
+        gradient, information = np.zeros(size), np.zeros(size)
+        sign = 1.0 if by == "persons" else -1.0
+        for chunk in self._chunks():
+            x, n_correct, n_incorrect = self._cells(chunk, theta, b)
+            _, (d_z, _), (i_zz, _, _) = cell_derivatives(alpha * x, q, n_correct, n_incorrect)
+            index = self._persons[chunk] if by == "persons" else self._items[chunk]
+            gradient += np.bincount(index, sign * alpha * d_z, minlength=size)
+            information += np.bincount(index, alpha ** 2 * i_zz, minlength=size)
+        return gradient, information
+
+    def _update_block(self, alpha, q, theta, b, by, max_step, bound, n_halvings=10):
+        gradient, information = self._score_block(alpha, q, theta, b, by)
+        step = -np.divide(gradient, information, out=np.zeros_like(gradient), where=information > 0)
+        step = np.clip(step, -max_step, max_step)
+        current = theta if by == "persons" else b
+        before = self._nll(alpha, q, theta, b, by=by)
+        # Each person (item) only affects its own cells, so step sizes are chosen independently
+        for _ in range(n_halvings):
+            candidate = np.clip(current + step, -bound, bound)
+            if by == "persons":
+                after = self._nll(alpha, q, candidate, b, by=by)
+            else:
+                after = self._nll(alpha, q, theta, candidate, by=by)
+            worse = after > before + 1e-12
+            if not np.any(worse):
+                break
+            step[worse] *= 0.5
+        step[worse] = 0.0
+        return np.clip(current + step, -bound, bound)
+
+    def _update_global(self, alpha, q, theta, b, n_halvings=30, ridge=1e-10):
+        gradient = np.zeros(2)
+        information = np.zeros((2, 2))
+        for chunk in self._chunks():
+            x, n_correct, n_incorrect = self._cells(chunk, theta, b)
+            # Same per-cell terms as BatchThreePL.nll_and_derivatives, with dz/dalpha = x
+            _, (d_z, d_q), (i_zz, i_zq, i_qq) = cell_derivatives(alpha * x, q, n_correct, n_incorrect)
+            gradient += [np.sum(d_z * x), np.sum(d_q)]
+            information += [[np.sum(i_zz * x ** 2), np.sum(i_zq * x)], [np.sum(i_zq * x), np.sum(i_qq)]]
+        step = -np.linalg.solve(information + ridge * np.eye(2), gradient)
+        before = self._nll(alpha, q, theta, b)
+        for _ in range(n_halvings):
+            new_alpha, new_q = max(alpha + step[0], 0.0), q + step[1]
+            if self._nll(new_alpha, new_q, theta, b) <= before + 1e-12:
+                return new_alpha, new_q
+            step *= 0.5
+        return alpha, q
+
+    def fit(self, max_iter=200, tol=1e-8, max_step=1.0, bound=6.0):
+        """
+        Alternate Fisher-scoring updates of the abilities, the difficulties and (alpha, q)
+        until the negative log-likelihood stops improving. Abilities/difficulties are kept in
+        [-bound, bound] so all-correct or all-wrong persons and items stay finite. After each
+        sweep the abilities are standardised to mean 0 and SD 1, with alpha and b absorbing the
+        change; this leaves the likelihood unchanged unless the standardised values have to be
+        clipped back into the bound, so the likelihood is evaluated after that step.
+        """
+        alpha, q = 1.0, 0.0
+        theta = np.zeros(self.n_persons)
+        b = np.zeros(self.n_items)
+        nll = self._nll(alpha, q, theta, b)
+        converged = False
+        for iteration in range(1, max_iter + 1):
+            theta = self._update_block(alpha, q, theta, b, "persons", max_step, bound)
+            b = self._update_block(alpha, q, theta, b, "items", max_step, bound)
+            alpha, q = self._update_global(alpha, q, theta, b)
+
+            mean, sd = theta.mean(), theta.std()
+            if sd > 0:
+                theta = np.clip((theta - mean) / sd, -bound, bound)
+                b = np.clip((b - mean) / sd, -bound, bound)
+                alpha = alpha * sd
+
+            # Re-evaluated after standardising, which changes the likelihood when the clip applies
+            new_nll = self._nll(alpha, q, theta, b)
+            if abs(nll - new_nll) < tol * max(1.0, abs(new_nll)):
+                nll = new_nll
+                converged = True
+                break
+            nll = new_nll
+
+        self._discrimination, self._logit_base_rate = alpha, q
+        self._abilities, self._difficulties = theta, b
+        self._is_fitted = True
+        return {"negative_log_likelihood": nll, "converged": converged, "n_iterations": iteration}
+
+    def _check_fitted(self):
+        if not self._is_fitted:
+            raise ValueError("Model has not been fitted yet. Call fit() first.")
+
+    def get_discrimination(self):
+        self._check_fitted()
+        return self._discrimination
+
+    def get_base_rate(self):
+        self._check_fitted()
+        return expit(self._logit_base_rate)
+
+    def get_logit_base_rate(self):
+        self._check_fitted()
+        return self._logit_base_rate
+
+    def get_abilities(self):
+        self._check_fitted()
+        return self._abilities
+
+    def get_difficulties(self):
+        self._check_fitted()
+        return self._difficulties
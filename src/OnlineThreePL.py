@@ -0,0 +1,110 @@
+#online estimation of the simplified 3PL model from mini-batches of counts or trials
+import numpy as np
+from src.Experiment import Experiment
+from src.BatchThreePL import DEFAULT_DIFFICULTY_PARAMS, fit_correct_total
+
+
+class OnlineThreePL:
+    """
+    Estimates the (alpha, q) of SimplifiedThreePL from data that arrives in mini-batches.
+
+    The likelihood only depends on the number of correct and total trials per condition, so
+    those K running sums are all that is kept: memory does not grow with the number of
+    batches or trials. After each batch, natural-gradient (Fisher scoring) steps of the
+    fit_batch solver, on the same log-space likelihood as fit(), move the estimate towards the
+    optimum of everything seen so far, starting from the previous estimate, so the result
+    converges to what fit() gives on the pooled data (both compare with the flat alpha = 0
+    model, which is the optimum for below-chance accuracy).
+    """
+
+    def __init__(self, difficulty_params=None, person_param=0, initial_guess=(1.0, 0.0)):
+        if difficulty_params is None:
+            difficulty_params = DEFAULT_DIFFICULTY_PARAMS
+        self._difficulty_params = np.asarray(difficulty_params, dtype=float)
+        self._person_param = person_param
+        self._n_correct = np.zeros(len(self._difficulty_params))
+        self._n_total = np.zeros(len(self._difficulty_params))
+        self._discrimination, self._logit_base_rate = max(float(initial_guess[0]), 0.0), float(initial_guess[1])
+        self._negative_log_likelihood = None
+        self._converged = False
+        self.n_batches = 0
+
+    @property
+    def n_trials(self):
+        """Total number of trials seen so far, counted by condition weight."""
+        return self._n_total.sum()
+
+    def partial_fit(self, counts, n_steps=10, tol=1e-8):
+        """
+        Add a mini-batch of condition counts and update the estimate.
+
+        counts is an Experiment or a (K, 4) array of hits, misses, falseAlarms,
+        correctRejections; row j is added to condition j (conditions and difficulty params are
+        paired up like zip() would). At most n_steps scoring steps are taken.
+        """
+        if isinstance(counts, Experiment):
+            counts = counts.cell_counts()
+        counts = np.asarray(counts, dtype=float)
+        if counts.ndim != 2 or counts.shape[1] != 4:
+            raise ValueError("Counts must have shape (K, 4)")
+        if not np.all(np.isfinite(counts)) or np.any(counts < 0):
+            raise ValueError("Counts must be non-negative and finite")
+        k = min(len(counts), len(self._n_total))
+        self._n_correct[:k] += counts[:k, 0] + counts[:k, 3]
+        self._n_total[:k] += counts[:k].sum(axis=1)
+        return self._update(n_steps, tol)
+
+    def partial_fit_trials(self, condition, signal_present, response, n_steps=10, tol=1e-8):
+        """
+        Add a mini-batch of single trials (condition index, stimulus present, responded "yes"),
+        as accepted by Experiment.record_trials, and update the estimate.
+        """
+        condition = np.asarray(condition).ravel()
+        signal_present = np.asarray(signal_present, dtype=bool).ravel()
+        response = np.asarray(response, dtype=bool).ravel()
+        if not len(condition) == len(signal_present) == len(response):
+            raise ValueError("condition, signal_present and response must have the same shape")
+        if len(condition):
+            if not np.issubdtype(condition.dtype, np.integer):
+                raise ValueError("Condition ids must be integers")
+            if condition.min() < 0 or condition.max() >= len(self._n_total):
+                raise ValueError("Condition id does not refer to a difficulty parameter")
+            # A trial is correct when the response matches the stimulus (hit or correct rejection)
+            correct = signal_present == response
+            self._n_correct += np.bincount(condition, weights=correct, minlength=len(self._n_total))
+            self._n_total += np.bincount(condition, minlength=len(self._n_total))
+        return self._update(n_steps, tol)
+
+    def _update(self, n_steps, tol):
+        self.n_batches += 1
+        if self.n_trials == 0:
+            return self._result()
+        result = fit_correct_total(self._n_correct, self._n_total, self._difficulty_params, self._person_param,
+                                   initial_guess=[self._discrimination, self._logit_base_rate],
+                                   max_iter=n_steps, tol=tol)
+        self._discrimination = float(result["discrimination"][0])
+        self._logit_base_rate = float(result["logit_base_rate"][0])
+        self._negative_log_likelihood = float(result["negative_log_likelihood"][0])
+        self._converged = bool(result["converged"][0])
+        return self._result()
+
+    def _result(self):
+        from scipy.special import expit
+        return {
+            "discrimination": self._discrimination,
+            "logit_base_rate": self._logit_base_rate,
+            "base_rate": expit(self._logit_base_rate),
+            "negative_log_likelihood": self._negative_log_likelihood,
+            "converged": self._converged,
+            "n_trials": self.n_trials,
+        }
+
+    def get_discrimination(self):
+        return self._discrimination
+
+    def get_base_rate(self):
+        from scipy.special import expit
+        return expit(self._logit_base_rate)
+
+    def get_logit_base_rate(self):
+        return self._logit_base_rate
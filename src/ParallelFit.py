@@ -0,0 +1,123 @@
+#process-pool driver for per-experiment SimplifiedThreePL.fit() calls
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from scipy.special import expit
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.BatchThreePL import experiments_to_counts, fit_batch
+
+
+def _fit_rows(counts, model_factory=SimplifiedThreePL, model_options=None, fit_options=None):
+    # counts is a (n, K, 4) block; one model is built and fitted per row
+    model_options = model_options or {}
+    fit_options = fit_options or {}
+    estimates = np.full((len(counts), 2), np.nan)
+    converged = np.zeros(len(counts), dtype=bool)
+    n_iterations = np.zeros(len(counts), dtype=int)
+    # Validate every row at once; invalid rows are left as NaN like rows whose fit fails
+    valid = np.all(np.isfinite(counts) & (counts >= 0), axis=(1, 2))
+    for i, rows in enumerate(counts):
+        if not valid[i]:
+            continue
+        experiment = Experiment.from_counts(rows, validate=False)
+        try:
+            result = model_factory(experiment, **model_options).fit(**fit_options)
+        except ValueError:
+            continue
+        estimates[i] = result.x
+        converged[i] = True
+        n_iterations[i] = result.nit
+    return estimates, converged, n_iterations
+
+
+def _fit_chunk(task):
+    # Runs in a worker: read the chunk straight out of the shared buffer instead of unpickling objects
+    name, shape, start, stop, model_factory, model_options, fit_options = task
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        counts = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        block = counts[start:stop].copy()
+    finally:
+        shm.close()
+    return _fit_rows(block, model_factory, model_options, fit_options)
+
+
+def fit_parallel(counts, max_workers=None, chunksize=None, difficulty_params=None, person_param=0,
+                 model_factory=SimplifiedThreePL, **fit_options):
+    """
+    Fit one SimplifiedThreePL per experiment across a process pool.
+
+    counts is either an (N, K, 4) array of hits, misses, falseAlarms, correctRejections
+    or a list of N Experiments with K conditions each. The counts are placed in shared
+    memory once and workers read their chunk by offset. Each worker builds
+    model_factory(experiment, difficulty_params=..., person_param=...) and calls
+    fit(**fit_options) on it (e.g. initial_guess, max_starts), so the factory must be
+    picklable. Returns a dict of length-N arrays in input order; experiments whose fit
+    raised have NaN estimates and converged False.
+    """
+    if isinstance(counts, (list, tuple)) and counts and isinstance(counts[0], Experiment):
+        counts = experiments_to_counts(counts)
+    counts = np.ascontiguousarray(counts, dtype=np.float64)
+    if counts.ndim != 3 or counts.shape[2] != 4:
+        raise ValueError("Counts must have shape (N, K, 4)")
+    n = counts.shape[0]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-n // (max_workers * 4)))
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+
+    estimates = np.full((n, 2), np.nan)
+    converged = np.zeros(n, dtype=bool)
+    n_iterations = np.zeros(n, dtype=int)
+    starts = range(0, n, chunksize)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(counts.nbytes, 1))
+    try:
+        shared = np.ndarray(counts.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = counts
+        model_options = {"difficulty_params": difficulty_params, "person_param": person_param}
+        tasks = [(shm.name, counts.shape, start, min(start + chunksize, n), model_factory, model_options, fit_options)
+                 for start in starts]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map() yields in submission order, so results line up with the input
+            for (_, _, start, stop, *_), (est, conv, nit) in zip(tasks, executor.map(_fit_chunk, tasks)):
+                estimates[start:stop] = est
+                converged[start:stop] = conv
+                n_iterations[start:stop] = nit
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return {
+        "discrimination": estimates[:, 0],
+        "logit_base_rate": estimates[:, 1],
+        "base_rate": expit(estimates[:, 1]),
+        "converged": converged,
+        "n_iterations": n_iterations
+    }
+
+
+def _fit_batch_chunk(task):
+    counts, kwargs = task
+    return fit_batch(counts, **kwargs)
+
+
+def fit_batch_parallel(counts, n_jobs=None, **kwargs):
+    """
+    Split an (N, K, 4) count array into n_jobs contiguous chunks and run fit_batch on each
+    in a process pool. Rows are fitted independently, so the result does not depend on n_jobs.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs <= 1 or len(counts) < 2:
+        return fit_batch(counts, **kwargs)
+    chunks = [chunk for chunk in np.array_split(counts, n_jobs) if len(chunk)]
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        parts = list(executor.map(_fit_batch_chunk, [(chunk, kwargs) for chunk in chunks]))
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
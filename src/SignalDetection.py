@@ -1,20 +1,83 @@
 # code base from UCI ZotGPT - prompted with original  equations and asked for code for each
 # changes made by group to handle edge cases
 import numpy as np
-from scipy.stats import norm
+
+
+def _ndtri(p):
+    # Inverse standard normal CDF (same values as scipy.stats.norm.ppf); scipy.special is
+    # imported on first use so count/AUC-only consumers never load it
+    from scipy.special import ndtri
+    return ndtri(p)
+
+
+# Python and NumPy integer/float scalars are accepted as counts
+_COUNT_TYPES = (int, float, np.integer, np.floating)
+
+
+def check_counts(counts):
+    """
+    Validate an (n, 4) array of hits, misses, falseAlarms, correctRejections in one
+    vectorized pass and return it as float64. Any integer or float dtype is accepted.
+    """
+    counts = np.asarray(counts)
+    if counts.ndim != 2 or counts.shape[1] != 4:
+        raise ValueError("Counts must have shape (n, 4)")
+    if not (np.issubdtype(counts.dtype, np.integer) or np.issubdtype(counts.dtype, np.floating)
+            or counts.dtype == bool):
+        raise ValueError("Inputs must be non-negative finite integers.")
+    counts = counts.astype(np.float64, copy=False)
+    if not np.all(np.isfinite(counts)) or np.any(counts < 0):
+        raise ValueError("Inputs must be non-negative finite integers.")
+    return counts
+
+
+def as_count(value):
+    """Counts are stored as float64; return a whole count as an int like the caller passed."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
 
 class SignalDetection:
+    __slots__ = ("hits", "misses", "falseAlarms", "correctRejections")
+
     def __init__(self, hits, misses, falseAlarms, correctRejections):
-        # Handles non-negative integers and decimals
-        if not all(isinstance(x, (int, float)) and x >= 0 and np.isfinite(x)
-                   for x in [hits, misses, falseAlarms, correctRejections]):
-            raise ValueError("Inputs must be non-negative finite integers.")
-        
+        # Handles non-negative integers and decimals, including NumPy scalars
+        for x in (hits, misses, falseAlarms, correctRejections):
+            if not (isinstance(x, _COUNT_TYPES) and x >= 0 and x != float("inf")):
+                raise ValueError("Inputs must be non-negative finite integers.")
+
         self.hits = hits
         self.misses = misses
         self.falseAlarms = falseAlarms
         self.correctRejections = correctRejections
 
+    @classmethod
+    def _trusted(cls, hits, misses, falseAlarms, correctRejections):
+        # Skip validation for counts that were already checked (e.g. rows of an Experiment)
+        sdt = cls.__new__(cls)
+        sdt.hits = hits
+        sdt.misses = misses
+        sdt.falseAlarms = falseAlarms
+        sdt.correctRejections = correctRejections
+        return sdt
+
+    @classmethod
+    def from_arrays(cls, hits, misses, falseAlarms, correctRejections, validate=True):
+        """
+        Build one SignalDetection per element of four equal-length count arrays. The arrays are
+        validated together with vectorized checks (skipped with validate=False for trusted input).
+        """
+        counts = np.column_stack(np.broadcast_arrays(hits, misses, falseAlarms, correctRejections))
+        counts = check_counts(counts) if validate else counts.astype(np.float64, copy=False)
+        conditions = []
+        new = cls.__new__
+        for hits, misses, false_alarms, correct_rejections in counts.tolist():
+            sdt = new(cls)
+            sdt.hits, sdt.misses = as_count(hits), as_count(misses)
+            sdt.falseAlarms, sdt.correctRejections = as_count(false_alarms), as_count(correct_rejections)
+            conditions.append(sdt)
+        return conditions
+
     def hit_rate(self):
         return self.hits / (self.hits + self.misses) if (self.hits + self.misses) > 0 else 0.5
 
@@ -28,8 +91,8 @@ class SignalDetection:
         hit_rate = self._adjusted_rate(self.hit_rate())
         fa_rate = self._adjusted_rate(self.false_alarm_rate())
         
-        z_hit = norm.ppf(hit_rate)
-        z_fa = norm.ppf(fa_rate)
+        z_hit = _ndtri(hit_rate)
+        z_fa = _ndtri(fa_rate)
         
         return z_hit - z_fa
 
@@ -37,7 +100,40 @@ class SignalDetection:
         hit_rate = self._adjusted_rate(self.hit_rate())
         fa_rate = self._adjusted_rate(self.false_alarm_rate())
         
-        z_hit = norm.ppf(hit_rate)
-        z_fa = norm.ppf(fa_rate)
+        z_hit = _ndtri(hit_rate)
+        z_fa = _ndtri(fa_rate)
         
         return -0.5 * (z_hit + z_fa)
+
+
+def batch_metrics(counts, lower=0.01, upper=0.99):
+    """
+    Rates, d', criterion and beta for every row of an (n, 4) array of
+    hits, misses, falseAlarms, correctRejections in one vectorized pass.
+    Rates are clamped to [lower, upper] before the z-transform, like d_prime().
+    """
+    counts = np.asarray(counts, dtype=float)
+    if counts.ndim != 2 or counts.shape[1] != 4:
+        raise ValueError("Counts must have shape (n, 4)")
+    if not 0 < lower <= upper < 1:
+        raise ValueError("Clamping bounds must satisfy 0 < lower <= upper < 1")
+    hits, misses, false_alarms, correct_rejections = counts.T
+    n_signal = hits + misses
+    n_noise = false_alarms + correct_rejections
+    hit_rate = np.divide(hits, n_signal, out=np.full(len(counts), 0.5), where=n_signal > 0)
+    fa_rate = np.divide(false_alarms, n_noise, out=np.full(len(counts), 0.5), where=n_noise > 0)
+    adjusted_hit_rate = np.clip(hit_rate, lower, upper)
+    adjusted_fa_rate = np.clip(fa_rate, lower, upper)
+    z_hit = _ndtri(adjusted_hit_rate)
+    z_fa = _ndtri(adjusted_fa_rate)
+    d_prime = z_hit - z_fa
+    criterion = -0.5 * (z_hit + z_fa)
+    return {
+        "hit_rate": hit_rate,
+        "false_alarm_rate": fa_rate,
+        "adjusted_hit_rate": adjusted_hit_rate,
+        "adjusted_false_alarm_rate": adjusted_fa_rate,
+        "d_prime": d_prime,
+        "criterion": criterion,
+        "beta": np.exp(d_prime * criterion)
+    }
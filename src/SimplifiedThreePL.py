@@ -1,29 +1,148 @@
 #initial code from ChatGPT, then continued to prompt ChatGPT with errors to fix code
+import hashlib
+import logging
+import time
+from collections import OrderedDict
 import numpy as np
-from scipy.optimize import minimize
-from scipy.special import expit, logit
 from src.Experiment import Experiment
+from src.SignalDetection import as_count
+from src.BatchThreePL import MIN_DISCRIMINATION, cell_nll, cell_derivatives, constant_rate_fit
+
+# SciPy is imported inside the methods that need it, so importing this module
+# (e.g. only for counts or AUC) does not pay for scipy.optimize/scipy.special
+
+logger = logging.getLogger(__name__)
+
+
+class FitCache:
+    """Bounded LRU cache of fit results keyed on a content hash of the fit inputs."""
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    @staticmethod
+    def key(n_correct, n_total, difficulty_params, person_param):
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (n_correct, n_total, difficulty_params, person_param):
+            array = np.ascontiguousarray(array, dtype=np.float64)
+            digest.update(str(array.shape).encode())
+            digest.update(array.tobytes())
+        return digest.digest()
+
+    def get(self, key):
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+    def __len__(self):
+        return len(self._results)
+
+
+# Starting points tried in order when L-BFGS-B does not converge from the first one
+_FALLBACK_STARTS = [(1.0, 0.0), (0.5, -2.0), (2.0, 2.0), (0.1, 0.0), (5.0, -4.0)]
+# |logit c| beyond this means c is within ~3e-7 of 0 or 1
+_SATURATED_LOGIT = 15.0
+
+
+def _bootstrap_parameters(fits):
+    # (n, 3) array of alpha, c and logit c from a fit_batch result
+    return np.column_stack([fits["discrimination"], fits["base_rate"], fits["logit_base_rate"]])
+
+
+class _FitRecorder:
+    """
+    Counts objective evaluations and reports one record per optimizer iteration; iterations
+    and elapsed time are counted per start of a multi-start fit.
+    """
+
+    def __init__(self, model, observer):
+        self.model = model
+        self.observer = observer
+        self.n_evaluations = 0
+        self.begin(0)
+
+    def begin(self, start):
+        # Iterations and elapsed time restart with every optimizer run of a multi-start fit
+        self.start = start
+        self.iteration = 0
+        self.started = time.perf_counter()
+
+    def objective(self, parameters):
+        self.n_evaluations += 1
+        return self.model.negative_log_likelihood(parameters)
+
+    def callback(self, parameters):
+        self.iteration += 1
+        record = {
+            "start": self.start,
+            "iteration": self.iteration,
+            "parameters": np.array(parameters, dtype=float),
+            "nll": self.model.negative_log_likelihood(parameters),
+            "gradient_norm": float(np.linalg.norm(self.model.gradient(parameters))),
+            "elapsed": time.perf_counter() - self.started,
+            "n_evaluations": self.n_evaluations
+        }
+        logger.debug("fit iteration %(iteration)d (start %(start)d): nll=%(nll).6g |grad|=%(gradient_norm).3g "
+                     "evaluations=%(n_evaluations)d elapsed=%(elapsed).6fs", record)
+        if self.observer is not None:
+            self.observer(record)
+
 
 class SimplifiedThreePL:
-    def __init__(self, experiment: Experiment):
+    def __init__(self, experiment: Experiment, cache: FitCache = None, observer=None,
+                 difficulty_params=None, person_param=0):
         if experiment is None:
             raise ValueError("Experiment cannot be None")
-        if len(experiment.conditions) == 0:
+        if len(experiment.counts) == 0:
             raise ValueError("Experiment must contain at least one condition")
         self.experiment = experiment
         self._base_rate = None
         self._logit_base_rate = None
         self._discrimination = None
         self._is_fitted = False
-        self._difficulty_params = np.array([2, 1, 0, -1, -2])
-        self._person_param = 0
+        if difficulty_params is None:
+            difficulty_params = [2, 1, 0, -1, -2]
+        self._difficulty_params = np.array(difficulty_params)
+        self._person_param = person_param
+        self._cache = cache
+        # Optional callable receiving a dict per optimizer iteration (see _FitRecorder)
+        self._observer = observer
+        self._pack_counts()
+
+    def _pack_counts(self):
+        # Pack the counts once so the likelihood never walks the condition objects;
+        # repacked only when trials have been streamed into the experiment since
+        # Rows are pooled per design cell, each counted as many times as its weight;
+        # zero-trial rows contribute nothing
+        counts = self.experiment.cell_counts()
+        self._n_correct = counts[:, 0] + counts[:, 3]
+        self._n_total = counts.sum(axis=1)
+        self._counts_version = self.experiment.version
 
     def summary(self):
-        n_total = sum(sdt.hits + sdt.misses + sdt.falseAlarms + sdt.correctRejections 
-                      for sdt in self.experiment.conditions)
-        n_correct = sum(sdt.hits + sdt.correctRejections for sdt in self.experiment.conditions)
+        hits, misses, false_alarms, correct_rejections = self.experiment.totals
+        n_total = as_count(hits + misses + false_alarms + correct_rejections)
+        n_correct = as_count(hits + correct_rejections)
         n_incorrect = n_total - n_correct
-        n_conditions = len(self.experiment.conditions)
+        n_conditions = as_count(self.experiment.weights.sum())
 
         return {
             "n_total": n_total,
@@ -33,35 +152,282 @@ class SimplifiedThreePL:
         }
 
     def predict(self, parameters):
+        from scipy.special import expit
         alpha, q = parameters
         c = expit(q)  # Transform q back to c using inverse logit
         if abs(alpha) < 1e-8:  # If discrimination is extremely low
             return np.full(len(self._difficulty_params), c)  # Return constant probability
         probabilities = c + (1 - c) / (1 + np.exp(-alpha * (self._person_param - self._difficulty_params)))
-        print(f"Predicted probabilities: {probabilities}") #debug
         return probabilities
 
+    def _counts(self, n):
+        if self.experiment.version != self._counts_version:
+            self._pack_counts()
+        # Conditions and difficulty params are paired up like zip() would
+        n = min(n, len(self._n_correct))
+        n_correct = self._n_correct[:n]
+        return n_correct, self._n_total[:n] - n_correct
+
+    def _cells(self, parameters):
+        # Linear predictor z = alpha * x and counts of the conditions that pair with a difficulty.
+        # alpha and q may be arrays; they broadcast against each other and over the conditions
+        alpha, q = parameters
+        x = self._person_param - self._difficulty_params
+        n_correct, n_incorrect = self._counts(len(x))
+        x = x[:len(n_correct)]
+        alpha = np.asarray(alpha, dtype=float)[..., None]
+        q = np.asarray(q, dtype=float)[..., None]
+        # predict() returns the constant c for near-zero alpha, which z = -inf reproduces
+        z = np.where(np.abs(alpha) < 1e-8, -np.inf, alpha * x)
+        return x, z, q, n_correct, n_incorrect
+
     def negative_log_likelihood(self, parameters):
-        probabilities = self.predict(parameters)
-        log_likelihood = 0
-        for p, sdt in zip(probabilities, self.experiment.conditions):
-            n_correct = sdt.hits + sdt.correctRejections
-            n_total = sdt.hits + sdt.misses + sdt.falseAlarms + sdt.correctRejections
-            log_likelihood += n_correct * np.log(p) + (n_total - n_correct) * np.log(1 - p)
-        return -log_likelihood
-
-    def fit(self):
-        initial_guess = [1.0, 0.0]  # Initial guess for alpha and q
-        bounds = [(0, None), (None, None)]  # alpha > 0, q unbounded
-        result = minimize(self.negative_log_likelihood, initial_guess, method='L-BFGS-B', bounds=bounds, options={'ftol': 1e-8})
-        
-        if result.success:
-            self._discrimination, self._logit_base_rate = result.x
-            self._base_rate = expit(self._logit_base_rate)
-            self._is_fitted = True
-            return result
-        else:
+        """
+        Negative log-likelihood at parameters = (alpha, q). alpha and q may also be arrays,
+        in which case they are broadcast together and an array of values is returned.
+        """
+        _, z, q, n_correct, n_incorrect = self._cells(parameters)
+        # Computed in log space, so probabilities that round to 0 or 1 stay finite
+        return np.sum(cell_nll(z, q, n_correct, n_incorrect), axis=-1)
+
+    def negative_log_likelihood_grid(self, discriminations, logit_base_rates):
+        """
+        Negative log-likelihood surface over every (alpha, q) pair of two 1-D grids, as a
+        (len(discriminations), len(logit_base_rates)) array computed in one broadcast pass.
+        """
+        alpha = np.asarray(discriminations, dtype=float).ravel()
+        q = np.asarray(logit_base_rates, dtype=float).ravel()
+        return self.negative_log_likelihood((alpha[:, None], q[None, :]))
+
+    def profile_likelihood(self, parameter, values):
+        """
+        Profile negative log-likelihood of "discrimination" or "logit_base_rate": for each
+        value the parameter is held fixed and the other one is minimised with L-BFGS-B.
+        Values are visited outwards from the fitted estimate (fit() is run if needed) and each
+        minimisation starts from the optimum of its neighbour; alpha = 0 is also checked.
+        Returns a dict of arrays in the order of values; deviance is twice the increase over
+        the minimum negative log-likelihood.
+        """
+        from scipy.optimize import minimize
+        if parameter not in ("discrimination", "logit_base_rate"):
+            raise ValueError('parameter must be "discrimination" or "logit_base_rate"')
+        values = np.asarray(values, dtype=float).ravel()
+        if not np.all(np.isfinite(values)):
+            raise ValueError("Profile values must be finite")
+        fixed = 0 if parameter == "discrimination" else 1
+        free = 1 - fixed
+        if fixed == 0 and np.any(values < 0):
+            raise ValueError("Discrimination values must be non-negative")
+        if not self._is_fitted:
+            self.fit()
+        estimate = np.array([self._discrimination, self._logit_base_rate], dtype=float)
+        bounds = [(0, None)] if free == 0 else [(None, None)]
+
+        def parameters_at(value, other):
+            parameters = np.empty(2)
+            parameters[fixed], parameters[free] = value, other
+            return parameters
+
+        nll = np.empty(len(values))
+        others = np.empty(len(values))
+        converged = np.zeros(len(values), dtype=bool)
+        order = np.argsort(values)
+        middle = int(np.searchsorted(values[order], estimate[fixed]))
+        # Sweep up from the estimate, then down from it, each slice warm-started from the previous one
+        for sweep in (order[middle:], order[:middle][::-1]):
+            start = estimate[free]
+            for i in sweep:
+                result = minimize(lambda z: self.negative_log_likelihood(parameters_at(values[i], z[0])), [start],
+                                  jac=lambda z: self.gradient(parameters_at(values[i], z[0]))[free:free + 1],
+                                  method='L-BFGS-B', bounds=bounds, options={'ftol': 1e-10})
+                nll[i], others[i], converged[i] = result.fun, result.x[0], result.success
+                if result.success and np.isfinite(result.fun):
+                    start = result.x[0]
+                if free == 0:
+                    # predict() jumps to the constant c at alpha = 0, which a local search cannot reach
+                    at_zero = self.negative_log_likelihood(parameters_at(values[i], 0.0))
+                    if at_zero < nll[i]:
+                        nll[i], others[i], converged[i] = at_zero, 0.0, True
+
+        minimum = min(self.negative_log_likelihood(estimate), np.min(nll))
+        profile = {
+            "values": values,
+            "negative_log_likelihood": nll,
+            "deviance": 2 * (nll - minimum),
+            "converged": converged,
+        }
+        profile["discrimination" if free == 0 else "logit_base_rate"] = others
+        profile[parameter] = values
+        return profile
+
+    def gradient(self, parameters):
+        """Analytic gradient of negative_log_likelihood with respect to (alpha, q)."""
+        x, z, q, n_correct, n_incorrect = self._cells(parameters)
+        # dz/dalpha = x; in the flat region z = -inf and the alpha-derivative vanishes
+        _, (d_z, d_q), _ = cell_derivatives(z, q, n_correct, n_incorrect)
+        return np.array([np.sum(d_z * x), np.sum(d_q)])
+
+    def hessian(self, parameters):
+        """Analytic Hessian of negative_log_likelihood with respect to (alpha, q)."""
+        x, z, q, n_correct, n_incorrect = self._cells(parameters)
+        _, _, (h_zz, h_zq, h_qq) = cell_derivatives(z, q, n_correct, n_incorrect, observed=True)
+        h_aa, h_aq, h_qq = np.sum(h_zz * x ** 2), np.sum(h_zq * x), np.sum(h_qq)
+        return np.array([[h_aa, h_aq], [h_aq, h_qq]])
+
+    def fit(self, warm_start=False, initial_guess=None, max_starts=len(_FALLBACK_STARTS) + 1):
+        """
+        Maximum likelihood fit of (alpha, q) with L-BFGS-B, alpha bounded below by
+        MIN_DISCRIMINATION. If the optimizer does not converge from the first starting point,
+        stops on a base rate saturated at 1, or stops on a local optimum that predict()'s flat
+        alpha = 0 model beats although accuracy is at least 0.5, the next points of
+        _FALLBACK_STARTS are tried in turn (at most max_starts runs). The best converged fit is
+        compared with the closed-form fit of the flat model and the better of the two is kept.
+        The result's n_starts is the number of runs and start the index of the run it came from.
+        """
+        from scipy.optimize import minimize
+        # Identical counts and item/person parameters give the same answer, so reuse it
+        key = None
+        if self._cache is not None:
+            n_correct, n_incorrect = self._counts(len(self._difficulty_params))
+            key = FitCache.key(n_correct, n_correct + n_incorrect, self._difficulty_params, self._person_param)
+            result = self._cache.get(key)
+            if result is not None:
+                self._set_fitted(result.x)
+                return result
+
+        if initial_guess is None:
+            initial_guess = [1.0, 0.0]  # Initial guess for alpha and q
+            if warm_start and self._discrimination is not None and self._logit_base_rate is not None:
+                # Refit from the previous (or user-set) estimate, e.g. after more trials were recorded
+                initial_guess = [self._discrimination, self._logit_base_rate]
+        # alpha stays on the smooth branch, as in fit_batch: predict()'s flat alpha = 0 model is a
+        # jump the optimizer would stall in, so it is compared in closed form afterwards
+        bounds = [(MIN_DISCRIMINATION, None), (None, None)]  # q unbounded
+        objective, callback, recorder = self.negative_log_likelihood, None, None
+        if self._observer is not None or logger.isEnabledFor(logging.DEBUG):
+            recorder = _FitRecorder(self, self._observer)
+            objective, callback = recorder.objective, recorder.callback
+        n_correct, n_incorrect = self._counts(len(self._difficulty_params))
+        flat_q, flat_nll = (value[0] for value in constant_rate_fit(n_correct[None], n_incorrect[None]))
+        # With accuracy >= 0.5 the smooth branch tends to the flat model as alpha -> 0 (c = 2 acc - 1),
+        # so a smooth optimum the flat model beats is only a local one
+        flat_reachable = flat_q >= 0
+        starts = [list(initial_guess)] + [list(start) for start in _FALLBACK_STARTS if list(start) != list(initial_guess)]
+        best = None
+        for n_starts, start in enumerate(starts[:max(max_starts, 1)], start=1):
+            start = [np.maximum(start[0], MIN_DISCRIMINATION), start[1]]
+            if recorder is not None:
+                recorder.begin(n_starts - 1)
+            result = minimize(objective, start, method='L-BFGS-B', jac=self.gradient,
+                              bounds=bounds, callback=callback, options={'ftol': 1e-8})
+            if not (result.success and np.isfinite(result.fun)):
+                logger.debug("fit from start %s did not converge: %s", start, result.message)
+                continue
+            if best is None or result.fun < best.fun:
+                best = result
+                best.start = n_starts - 1
+            if flat_reachable and flat_nll < best.fun - 1e-6 * max(1.0, abs(best.fun)):
+                continue
+            # An optimum on the alpha bound is final once compared with the flat model below, and
+            # c -> 0 is the plain logistic model, whose alpha is still identified; only c -> 1
+            # (every p flat at 1) may be a region the optimizer stalled in, so try the next start
+            if best.x[1] < _SATURATED_LOGIT:
+                break
+        if best is None:
             raise ValueError("Optimization failed to converge.")
+        if not flat_nll >= best.fun - 1e-9 * max(1.0, abs(best.fun)):
+            # predict()'s flat model explains the data better than any point the optimizer reached,
+            # as for below-chance accuracy, where the smooth branch cannot get down to c
+            best.x = np.array([0.0, flat_q])
+            best.fun = flat_nll
+            best.jac = self.gradient(best.x)
+            best.message = "Flat alpha = 0 model fits best"
+        best.n_starts = n_starts
+        if key is not None:
+            self._cache.put(key, best)
+        self._set_fitted(best.x)
+        return best
+
+    def _set_fitted(self, parameters):
+        from scipy.special import expit
+        self._discrimination, self._logit_base_rate = parameters
+        self._base_rate = expit(self._logit_base_rate)
+        self._is_fitted = True
+
+    def bootstrap(self, n_resamples=1000, seed=None, n_jobs=1, confidence=0.95, method="percentile"):
+        """
+        Parametric binomial bootstrap confidence intervals for alpha, c and logit c.
+
+        Hit and false alarm counts of every design cell (weighted and pooled like the
+        likelihood's, see Experiment.cell_counts) are redrawn from their observed rates in one
+        array with a seeded Generator, and all resamples are fitted together with fit_batch
+        (split across n_jobs processes). Non-integer weighted totals are rounded for the draw
+        and the draws scaled back to them. method is "percentile" or "bca"; the BCa bias
+        correction is relative to the fitted estimate, or to fit_batch's if the model is not fitted.
+        """
+        if method not in ("percentile", "bca"):
+            raise ValueError("method must be 'percentile' or 'bca'")
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1 (exclusive).")
+        if n_resamples < 2:
+            raise ValueError("n_resamples must be at least 2")
+        from scipy.special import ndtr, ndtri
+        from src.BatchThreePL import fit_batch
+        from src.ParallelFit import fit_batch_parallel
+
+        cell_counts = self.experiment.cell_counts()
+        n_conditions = min(len(cell_counts), len(self._difficulty_params))
+        counts = np.array(cell_counts[:n_conditions])
+        fit_options = {"difficulty_params": self._difficulty_params[:n_conditions],
+                       "person_param": self._person_param}
+        if self._is_fitted:
+            # Centre the intervals (and the BCa bias correction) on the estimate the model reports
+            estimate = np.array([self._discrimination, self._base_rate, self._logit_base_rate], dtype=float)
+        else:
+            estimate = _bootstrap_parameters(fit_batch(counts[None], **fit_options))[0]
+
+        # Draw every resample in the parent so results do not depend on n_jobs
+        rng = np.random.default_rng(seed)
+        n_signal = counts[:, 0] + counts[:, 1]
+        n_noise = counts[:, 2] + counts[:, 3]
+        hit_rate = np.divide(counts[:, 0], n_signal, out=np.zeros(n_conditions), where=n_signal > 0)
+        fa_rate = np.divide(counts[:, 2], n_noise, out=np.zeros(n_conditions), where=n_noise > 0)
+        draws_signal, draws_noise = np.rint(n_signal), np.rint(n_noise)
+        hits = rng.binomial(draws_signal.astype(np.int64), hit_rate, size=(n_resamples, n_conditions))
+        false_alarms = rng.binomial(draws_noise.astype(np.int64), fa_rate, size=(n_resamples, n_conditions))
+        hits = hits * np.divide(n_signal, draws_signal, out=np.zeros(n_conditions), where=draws_signal > 0)
+        false_alarms = false_alarms * np.divide(n_noise, draws_noise, out=np.zeros(n_conditions), where=draws_noise > 0)
+        resamples = np.stack([hits, n_signal - hits, false_alarms, n_noise - false_alarms], axis=2)
+
+        fits = fit_batch_parallel(resamples, n_jobs=n_jobs, **fit_options)
+        replicates = _bootstrap_parameters(fits)[fits["converged"]]
+
+        tail = (1 - confidence) / 2
+        if method == "percentile":
+            lower = np.full(3, tail)
+            upper = np.full(3, 1 - tail)
+        else:
+            # Bias correction from the replicates, acceleration from a leave-one-condition-out jackknife
+            z0 = ndtri(np.clip(np.mean(replicates < estimate, axis=0), 1 / len(replicates), 1 - 1 / len(replicates)))
+            jackknife = np.array([
+                _bootstrap_parameters(fit_batch(np.delete(counts, i, axis=0)[None],
+                                                difficulty_params=np.delete(fit_options["difficulty_params"], i),
+                                                person_param=self._person_param))[0]
+                for i in range(n_conditions)])
+            deviation = jackknife.mean(axis=0) - jackknife
+            denominator = 6 * np.sum(deviation ** 2, axis=0) ** 1.5
+            acceleration = np.divide(np.sum(deviation ** 3, axis=0), denominator,
+                                     out=np.zeros(3), where=denominator > 0)
+            z_lower, z_upper = ndtri(tail), ndtri(1 - tail)
+            lower = ndtr(z0 + (z0 + z_lower) / (1 - acceleration * (z0 + z_lower)))
+            upper = ndtr(z0 + (z0 + z_upper) / (1 - acceleration * (z0 + z_upper)))
+
+        intervals = {}
+        for i, name in enumerate(("discrimination", "base_rate", "logit_base_rate")):
+            intervals[name] = np.quantile(replicates[:, i], [lower[i], upper[i]])
+        intervals["n_resamples"] = n_resamples
+        intervals["n_converged"] = len(replicates)
+        return intervals
 
     def get_discrimination(self):
         if not self._is_fitted:
@@ -85,6 +451,7 @@ class SimplifiedThreePL:
         self._is_fitted = False
 
     def set_base_rate(self, value):
+        from scipy.special import logit
         if not 0 < value < 1:
             raise ValueError("Base rate (c) must be between 0 and 1 (exclusive).")
         self._base_rate = value
@@ -92,6 +459,7 @@ class SimplifiedThreePL:
         self._is_fitted = False
 
     def set_logit_base_rate(self, value):
+        from scipy.special import expit
         self._logit_base_rate = value
         self._base_rate = expit(value)
         self._is_fitted = False
@@ -0,0 +1,168 @@
+#chunked loader that aggregates raw trial logs into per-participant count tensors and Experiments
+import os
+from itertools import islice
+import numpy as np
+from src.Experiment import Experiment
+
+DEFAULT_COLUMNS = ("participant", "condition", "signal", "response")
+
+
+class TrialCounter:
+    """
+    Running (N, K, 4) tensor of hits, misses, falseAlarms, correctRejections built from
+    trial-level arrays. Every update() is one vectorized count over the flattened
+    (participant, condition, outcome) cell index, so memory is bounded by the tensor and
+    the chunk rather than by the number of trials. When n_participants/n_conditions are not
+    given the tensor grows to fit the largest id seen so far.
+    """
+
+    def __init__(self, n_participants=None, n_conditions=None):
+        self._fixed_shape = (n_participants, n_conditions)
+        self._counts = np.zeros((n_participants or 0, n_conditions or 0, 4), dtype=np.float64)
+        self._n_participants = n_participants or 0
+        self._n_conditions = n_conditions or 0
+        self.n_trials = 0
+
+    @property
+    def counts(self):
+        """(N, K, 4) counts; N and K are one more than the largest participant and condition ids."""
+        return self._counts[:self._n_participants, :self._n_conditions]
+
+    def _grow(self, n_participants, n_conditions):
+        for needed, fixed, what in ((n_participants, self._fixed_shape[0], "Participant"),
+                                    (n_conditions, self._fixed_shape[1], "Condition")):
+            if fixed is not None and needed > fixed:
+                raise ValueError(f"{what} id out of range")
+        capacity_n, capacity_k, _ = self._counts.shape
+        if n_participants > capacity_n or n_conditions > capacity_k:
+            # Participants usually arrive in order, so over-allocate that axis to avoid repeated copies
+            if n_participants > capacity_n:
+                capacity_n = max(n_participants, 2 * capacity_n)
+            capacity_k = max(n_conditions, capacity_k)
+            counts = np.zeros((capacity_n, capacity_k, 4), dtype=np.float64)
+            counts[:self._n_participants, :self._n_conditions] = self.counts
+            self._counts = counts
+        self._n_participants = max(self._n_participants, n_participants)
+        self._n_conditions = max(self._n_conditions, n_conditions)
+
+    def update(self, participants, conditions, signal_present, responses):
+        """Add equal-length arrays of trials (participant id, condition id, stimulus present, responded "yes")."""
+        participants = np.asarray(participants)
+        conditions = np.asarray(conditions)
+        signal_present = np.asarray(signal_present)
+        responses = np.asarray(responses)
+        if not participants.shape == conditions.shape == signal_present.shape == responses.shape:
+            raise ValueError("participant, condition, signal and response columns must have the same shape")
+        if participants.size == 0:
+            return
+        participants, conditions = participants.ravel(), conditions.ravel()
+        signal_present, responses = signal_present.ravel(), responses.ravel()
+        for values, what in ((participants, "Participant"), (conditions, "Condition")):
+            if not np.issubdtype(values.dtype, np.integer):
+                raise ValueError(f"{what} ids must be integers")
+            if values.min() < 0:
+                raise ValueError(f"{what} ids must be non-negative")
+        for values, what in ((signal_present, "Signal"), (responses, "Response")):
+            if values.dtype != bool and (values.min() < 0 or values.max() > 1):
+                raise ValueError(f"{what} values must be 0 or 1")
+        self._grow(int(participants.max()) + 1, int(conditions.max()) + 1)
+
+        # Column 0..3 = hits, misses, falseAlarms, correctRejections, as in Experiment.record_trials
+        column = np.where(signal_present, 0, 2) + (responses == 0)
+        n_cells = self._counts.shape[1] * 4
+        index = participants.astype(np.int64) * n_cells + conditions * 4 + column
+        flat = self._counts.reshape(-1)
+        if flat.size <= 4 * index.size:
+            flat += np.bincount(index, minlength=flat.size)
+        else:
+            # Few trials relative to the tensor: count only the cells that occur
+            cells, n = np.unique(index, return_counts=True)
+            flat[cells] += n
+        self.n_trials += index.size
+
+
+def _resolve_columns(columns, names):
+    if names is None:
+        if not all(isinstance(column, (int, np.integer)) for column in columns):
+            raise ValueError("Column names need a header row; pass column indices instead")
+        return list(columns)
+    resolved = []
+    for column in columns:
+        if isinstance(column, (int, np.integer)):
+            resolved.append(int(column))
+        elif column in names:
+            resolved.append(names.index(column))
+        else:
+            raise ValueError(f"Column {column!r} not found in header {names}")
+    return resolved
+
+
+def _csv_chunks(path, columns, chunk_size, delimiter, header):
+    with open(path) as f:
+        names = None
+        if header:
+            names = [name.strip() for name in f.readline().rstrip("\r\n").split(delimiter)]
+        usecols = _resolve_columns(columns, names)
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                return
+            block = np.loadtxt(lines, delimiter=delimiter, dtype=np.int64, usecols=usecols, ndmin=2)
+            yield block[:, 0], block[:, 1], block[:, 2], block[:, 3]
+
+
+def _npy_chunks(path, columns, chunk_size):
+    # Memory-mapped, so only the current chunk is ever read into memory
+    trials = np.load(path, mmap_mode="r")
+    if trials.dtype.names is not None:
+        missing = [column for column in columns if column not in trials.dtype.names]
+        if missing:
+            raise ValueError(f"Fields {missing} not found in {path}")
+        for start in range(0, len(trials), chunk_size):
+            block = trials[start:start + chunk_size]
+            yield tuple(np.asarray(block[column]) for column in columns)
+        return
+    if trials.ndim != 2:
+        raise ValueError("A .npy trial file must be a 2-D array or a structured array")
+    usecols = _resolve_columns(columns, None) if columns != DEFAULT_COLUMNS else [0, 1, 2, 3]
+    for start in range(0, len(trials), chunk_size):
+        block = np.asarray(trials[start:start + chunk_size])
+        yield tuple(block[:, column] for column in usecols)
+
+
+def load_trials(path, chunk_size=1_000_000, columns=DEFAULT_COLUMNS, delimiter=",", header=True,
+                n_participants=None, n_conditions=None):
+    """
+    Aggregate a trial log into an (N, K, 4) array of hits, misses, falseAlarms, correctRejections.
+
+    path is a CSV file (header row naming the columns unless header=False) or a .npy file
+    holding a 2-D integer array or a structured array with named fields. Each trial has a
+    non-negative integer participant id and condition id, and 0/1 for signal present and
+    response "yes". The file is read chunk_size rows at a time.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if len(columns) != 4:
+        raise ValueError("columns must name the participant, condition, signal and response columns")
+    if os.path.splitext(path)[1].lower() == ".npy":
+        chunks = _npy_chunks(path, columns, chunk_size)
+    else:
+        chunks = _csv_chunks(path, columns, chunk_size, delimiter, header)
+    counter = TrialCounter(n_participants, n_conditions)
+    for participants, conditions, signal_present, responses in chunks:
+        counter.update(participants, conditions, signal_present, responses)
+    return np.ascontiguousarray(counter.counts)
+
+
+def counts_to_experiments(counts):
+    """Wrap each participant of an (N, K, 4) count array in an Experiment that shares its rows."""
+    counts = np.asarray(counts, dtype=np.float64)
+    if counts.ndim != 3 or counts.shape[2] != 4:
+        raise ValueError("Counts must have shape (N, K, 4)")
+    label_codes = np.full(counts.shape[1], -1, dtype=np.int64)
+    return [Experiment._from_columns(rows, label_codes, []) for rows in counts]
+
+
+def load_experiments(path, **kwargs):
+    """Aggregate a trial log (see load_trials) into one Experiment per participant."""
+    return counts_to_experiments(load_trials(path, **kwargs))
@@ -0,0 +1,95 @@
+#testing script for BatchThreePL
+import unittest
+import numpy as np
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.BatchThreePL import fit_batch, experiments_to_counts, nll_and_derivatives, DEFAULT_DIFFICULTY_PARAMS
+
+class TestBatchThreePL(unittest.TestCase):
+
+    def setUp(self):
+        self.experiment = Experiment()
+        conditions = [
+            SignalDetection(hits=55, misses=45, falseAlarms=45, correctRejections=55),
+            SignalDetection(hits=60, misses=40, falseAlarms=40, correctRejections=60),
+            SignalDetection(hits=75, misses=25, falseAlarms=25, correctRejections=75),
+            SignalDetection(hits=90, misses=10, falseAlarms=10, correctRejections=90),
+            SignalDetection(hits=95, misses=5, falseAlarms=5, correctRejections=95)
+        ]
+        for i, condition in enumerate(conditions):
+            self.experiment.add_condition(condition, f"Condition {i+1}")
+
+    def test_matches_single_fit(self):
+        # The batched solver should land on the same estimate as SimplifiedThreePL.fit()
+        model = SimplifiedThreePL(self.experiment)
+        model.fit()
+        result = fit_batch([self.experiment])
+        self.assertTrue(result["converged"][0])
+        self.assertAlmostEqual(result["discrimination"][0], model.get_discrimination(), places=3)
+        self.assertAlmostEqual(result["base_rate"][0], model.get_base_rate(), places=3)
+
+    def test_many_experiments(self):
+        # Recover parameters for a stack of simulated participants
+        rng = np.random.default_rng(0)
+        n_participants, n_trials = 500, 200
+        alpha = rng.uniform(0.5, 2.5, n_participants)
+        c = rng.uniform(0.1, 0.5, n_participants)
+        x = 0 - np.array([2, 1, 0, -1, -2])
+        p = c[:, None] + (1 - c[:, None]) / (1 + np.exp(-alpha[:, None] * x))
+        hits = rng.binomial(n_trials, p)
+        false_alarms = rng.binomial(n_trials, 1 - p)
+        counts = np.stack([hits, n_trials - hits, false_alarms, n_trials - false_alarms], axis=2)
+
+        result = fit_batch(counts)
+        self.assertEqual(result["discrimination"].shape, (n_participants,))
+        self.assertTrue(np.all(result["converged"]))
+        self.assertTrue(np.all(result["discrimination"] >= 0))
+        self.assertLess(np.median(np.abs(result["discrimination"] - alpha)), 0.2)
+        self.assertLess(np.median(np.abs(result["base_rate"] - c)), 0.05)
+
+    def test_alpha_bound(self):
+        # Uninformative data pushes alpha onto its bound; the solver must still reach the optimum
+        # of SimplifiedThreePL's model (including its flat alpha = 0 case) before reporting convergence
+        rng = np.random.default_rng(3)
+        counts = rng.integers(0, 60, (100, 5, 4)).astype(float)
+        result = fit_batch(counts)
+        self.assertTrue(np.all(result["converged"]))
+        for i in range(len(counts)):
+            model = SimplifiedThreePL(Experiment.from_counts(counts[i]))
+            reference = model.fit()
+            nll = model.negative_log_likelihood([result["discrimination"][i], result["logit_base_rate"][i]])
+            self.assertAlmostEqual(nll, result["negative_log_likelihood"][i], places=6)
+            self.assertLessEqual(nll, reference.fun + 1e-6)
+
+    def test_log_space_derivatives(self):
+        # The shared helper matches SimplifiedThreePL and stays finite where p rounds to 0 or 1
+        model = SimplifiedThreePL(self.experiment)
+        counts = experiments_to_counts([self.experiment])
+        n_correct = counts[:, :, 0] + counts[:, :, 3]
+        n_incorrect = counts.sum(axis=2) - n_correct
+        x = 0 - DEFAULT_DIFFICULTY_PARAMS
+        for params in ([1.3, -0.4], [40.0, 0.0], [1.0, 40.0], [1.0, -800.0]):
+            nll, gradient, information = nll_and_derivatives(np.array([params[0]]), np.array([params[1]]),
+                                                             x, n_correct, n_incorrect)
+            self.assertTrue(np.all(np.isfinite(information)))
+            self.assertAlmostEqual(nll[0], model.negative_log_likelihood(params), places=8)
+            np.testing.assert_allclose(gradient[0], model.gradient(params), rtol=1e-8, atol=1e-10)
+
+    def test_experiments_to_counts(self):
+        counts = experiments_to_counts([self.experiment, self.experiment])
+        self.assertEqual(counts.shape, (2, 5, 4))
+        np.testing.assert_array_equal(counts[1, 0], [55, 45, 45, 55])
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            fit_batch(np.zeros((3, 5)))
+        with self.assertRaises(ValueError):
+            fit_batch(-np.ones((3, 5, 4)))
+        short_experiment = Experiment()
+        short_experiment.add_condition(SignalDetection(1, 1, 1, 1))
+        with self.assertRaises(ValueError):
+            experiments_to_counts([self.experiment, short_experiment])
+
+if __name__ == '__main__':
+    unittest.main()
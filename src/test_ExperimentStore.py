@@ -0,0 +1,89 @@
+#testing script for ExperimentStore
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.ExperimentStore import ExperimentStore
+
+class TestExperimentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "store")
+        self.experiments = []
+        for shift in range(3):
+            experiment = Experiment()
+            for i, hits in enumerate([55, 60, 75, 90, 95]):
+                experiment.add_condition(SignalDetection(hits + shift, 100 - hits - shift, 100 - hits, hits),
+                                         f"Condition {i+1}" if i != 2 else None)
+            self.experiments.append(experiment)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        ExperimentStore.create(self.path, self.experiments[:2])
+        store = ExperimentStore(self.path)
+        self.assertEqual(len(store), 2)
+        for i in range(2):
+            experiment = store.experiment(i)
+            np.testing.assert_array_equal(experiment.counts, self.experiments[i].counts)
+            self.assertEqual(list(experiment.labels), list(self.experiments[i].labels))
+            self.assertAlmostEqual(experiment.compute_auc(), self.experiments[i].compute_auc())
+            self.assertEqual(experiment.conditions[0].hits, self.experiments[i].conditions[0].hits)
+        self.assertTrue(np.all(np.isnan(store.parameters)))
+
+        # The stored counts feed the likelihood directly
+        model = SimplifiedThreePL(store.experiment(0))
+        reference = SimplifiedThreePL(self.experiments[0])
+        self.assertAlmostEqual(model.negative_log_likelihood([1.0, 0.0]),
+                               reference.negative_log_likelihood([1.0, 0.0]))
+
+    def test_append_and_parameters(self):
+        store = ExperimentStore.create(self.path, self.experiments[:1])
+        counts_size = os.path.getsize(os.path.join(self.path, "counts.f8"))
+        store.append(self.experiments[1:], parameters=[[1.0, 0.5], [2.0, -0.5]])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "counts.f8")), 3 * counts_size)
+
+        model = SimplifiedThreePL(store.experiment(0))
+        model.fit()
+        store.set_parameters(0, model.get_discrimination(), model.get_logit_base_rate())
+        reopened = ExperimentStore(self.path)
+        np.testing.assert_allclose(reopened.parameters[0], [model.get_discrimination(), model.get_logit_base_rate()])
+        np.testing.assert_array_equal(reopened.parameters[1:], [[1.0, 0.5], [2.0, -0.5]])
+        np.testing.assert_array_equal(reopened.counts(-1), self.experiments[2].counts)
+        self.assertEqual(len(reopened.label_values), 4)
+
+        weighted = Experiment()
+        weighted.add_condition(SignalDetection(1, 2, 3, 4), weight=3)
+        weighted.add_condition(SignalDetection(0, 0, 0, 0), cell=0)
+        reopened.append([weighted])
+        np.testing.assert_array_equal(reopened.experiment(3).weights, [3, 1])
+        np.testing.assert_array_equal(reopened.experiment(3).cells, [0, 0])
+        np.testing.assert_array_equal(reopened.experiment(3).totals, [3, 6, 9, 12])
+
+    def test_experiment_views_are_copy_on_write(self):
+        ExperimentStore.create(self.path, self.experiments[:1])
+        experiment = ExperimentStore(self.path).experiment(0)
+        experiment.record_trials(0, True, True)
+        experiment.add_condition(SignalDetection(1, 1, 1, 1), "New")
+        self.assertEqual(len(experiment.conditions), 6)
+        self.assertEqual(experiment.labels[5], "New")
+        np.testing.assert_array_equal(ExperimentStore(self.path).counts(0), self.experiments[0].counts)
+
+    def test_invalid_store(self):
+        with self.assertRaises(ValueError):
+            ExperimentStore(self.path)
+        store = ExperimentStore.create(self.path)
+        with self.assertRaises(IndexError):
+            store.experiment(0)
+        with self.assertRaises(ValueError):
+            store.append(self.experiments, parameters=[[1.0, 0.0]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#testing script for FitService
+import asyncio
+import unittest
+import numpy as np
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src import FitService as FitServiceModule
+from src.FitService import FitService, ServiceOverloaded, fit_async
+
+class TestFitService(unittest.TestCase):
+
+    def setUp(self):
+        self.experiments = []
+        for shift in range(20):
+            experiment = Experiment()
+            for hits in [55, 60, 75, 90, 95]:
+                hits = min(hits + shift % 5, 99)
+                experiment.add_condition(SignalDetection(hits, 100 - hits, 100 - hits, hits))
+            self.experiments.append(experiment)
+
+    def test_concurrent_requests_are_batched(self):
+        async def run():
+            async with FitService(window=0.05) as service:
+                results = await asyncio.gather(*(service.fit_async(e) for e in self.experiments))
+                return results, service.metrics
+
+        results, metrics = asyncio.run(run())
+        self.assertEqual(metrics["requests"], 20)
+        self.assertEqual(metrics["fitted"], 20)
+        self.assertLess(metrics["batches"], 20)
+        self.assertEqual(metrics["pending"], 0)
+        for experiment, result in zip(self.experiments[:5], results):
+            model = SimplifiedThreePL(experiment)
+            model.fit()
+            self.assertTrue(result["converged"])
+            self.assertAlmostEqual(result["discrimination"], model.get_discrimination(), places=3)
+            self.assertAlmostEqual(result["base_rate"], model.get_base_rate(), places=3)
+
+    def test_mixed_shapes_and_default_service(self):
+        short = Experiment()
+        short.add_condition(SignalDetection(60, 40, 40, 60))
+        short.add_condition(SignalDetection(90, 10, 10, 90))
+
+        async def run():
+            return await asyncio.gather(fit_async(self.experiments[0]), fit_async(short))
+
+        full_result, short_result = asyncio.run(run())
+        self.assertTrue(full_result["converged"])
+        self.assertIn("discrimination", short_result)
+
+    def test_default_service_is_released(self):
+        async def run():
+            await fit_async(self.experiments[0])
+            return FitServiceModule._default_services[asyncio.get_running_loop()]
+
+        service = asyncio.run(run())
+        # asyncio.run cancels the worker on shutdown, which stops the executor and drops the entry
+        self.assertEqual(FitServiceModule._default_services, {})
+        self.assertIsNone(service._executor)
+        self.assertIsNone(service._worker)
+
+    def test_backpressure(self):
+        async def run():
+            service = FitService(window=0.0, max_batch_size=1, max_pending=1)
+            await service.start()
+            # Stop the batching task so the single queue slot stays taken
+            service._worker.cancel()
+            service._queue.put_nowait((np.zeros((5, 4)), asyncio.get_running_loop().create_future()))
+            with self.assertRaises(ServiceOverloaded):
+                await service.fit_async(self.experiments[1], timeout=0.01)
+            return service.metrics
+
+        metrics = asyncio.run(run())
+        self.assertEqual(metrics["rejected"], 1)
+
+    def test_invalid_input(self):
+        async def run():
+            async with FitService() as service:
+                await service.fit_async(np.zeros((5, 3)))
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+    def test_bad_request_fails_alone(self):
+        bad = np.full((5, 4), 10.0)
+        bad[2, 1] = -1
+
+        async def run():
+            async with FitService(window=0.05) as service:
+                return await asyncio.gather(service.fit_async(self.experiments[0]), service.fit_async(bad),
+                                            return_exceptions=True)
+
+        good_result, bad_result = asyncio.run(run())
+        self.assertTrue(good_result["converged"])
+        self.assertIsInstance(bad_result, ValueError)
+
+if __name__ == '__main__':
+    unittest.main()
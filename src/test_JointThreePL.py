@@ -0,0 +1,68 @@
+#testing script for JointThreePL
+import unittest
+import numpy as np
+from src.JointThreePL import JointThreePL
+
+class TestJointThreePL(unittest.TestCase):
+
+    def setUp(self):
+        # Simulated persons x items design with a third of the cells unobserved
+        rng = np.random.default_rng(0)
+        n_persons, n_items, n_trials = 400, 12, 20
+        self.abilities = rng.normal(size=n_persons)
+        self.difficulties = np.linspace(-2, 2, n_items)
+        p = 0.2 + 0.8 / (1 + np.exp(-1.5 * (self.abilities[:, None] - self.difficulties)))
+        n_total = np.where(rng.random((n_persons, n_items)) < 0.3, 0, n_trials)
+        n_correct = rng.binomial(n_total, p)
+        zeros = np.zeros_like(n_correct)
+        self.counts = np.stack([n_correct, n_total - n_correct, zeros, zeros], axis=2)
+
+    def test_recovers_parameters(self):
+        model = JointThreePL(self.counts)
+        result = model.fit()
+        self.assertTrue(result["converged"])
+        self.assertAlmostEqual(model.get_discrimination(), 1.5, delta=0.3)
+        self.assertAlmostEqual(model.get_base_rate(), 0.2, delta=0.05)
+        self.assertGreater(np.corrcoef(model.get_difficulties(), self.difficulties)[0, 1], 0.99)
+        self.assertGreater(np.corrcoef(model.get_abilities(), self.abilities)[0, 1], 0.9)
+        self.assertAlmostEqual(np.mean(model.get_abilities()), 0.0, places=3)
+
+    def test_reported_likelihood(self):
+        # All-correct and all-wrong persons sit on the ability bound, so standardising the
+        # abilities gets clipped; the reported likelihood must still be that of the fitted values
+        counts = self.counts.copy()
+        counts[:5, :, 0] = counts[:5, :, 0] + counts[:5, :, 1]
+        counts[:5, :, 1] = 0
+        counts[5:10, :, 1] = counts[5:10, :, 0] + counts[5:10, :, 1]
+        counts[5:10, :, 0] = 0
+        model = JointThreePL(counts)
+        result = model.fit(bound=3.0)
+        self.assertTrue(np.any(np.abs(model.get_abilities()) == 3.0))
+        self.assertAlmostEqual(result["negative_log_likelihood"],
+                               model.negative_log_likelihood(model.get_discrimination(), model.get_logit_base_rate(),
+                                                             model.get_abilities(), model.get_difficulties()))
+
+    def test_chunking_and_cells(self):
+        # Chunked passes and coordinate input give the same fit as the dense default
+        dense = JointThreePL(self.counts)
+        dense.fit()
+        n_correct = self.counts[:, :, 0]
+        n_total = self.counts[:, :, 0] + self.counts[:, :, 1]
+        persons, items = np.nonzero(n_total)
+        sparse = JointThreePL.from_cells(persons, items, n_correct[persons, items], n_total[persons, items],
+                                         chunk_size=97)
+        sparse.fit()
+        self.assertAlmostEqual(sparse.get_discrimination(), dense.get_discrimination(), places=8)
+        np.testing.assert_allclose(sparse.get_difficulties(), dense.get_difficulties(), atol=1e-8)
+
+    def test_not_fitted_and_invalid(self):
+        model = JointThreePL(self.counts)
+        with self.assertRaises(ValueError):
+            model.get_abilities()
+        with self.assertRaises(ValueError):
+            JointThreePL(np.zeros((3, 4)))
+        with self.assertRaises(ValueError):
+            JointThreePL.from_cells([0], [0], [5], [3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#testing script for OnlineThreePL
+import unittest
+import numpy as np
+from scipy.special import expit
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.OnlineThreePL import OnlineThreePL
+
+class TestOnlineThreePL(unittest.TestCase):
+
+    def setUp(self):
+        # Simulated trial log for one pooled experiment
+        rng = np.random.default_rng(1)
+        n = 40000
+        alpha, c = 1.4, 0.25
+        x = 0 - np.array([2, 1, 0, -1, -2])
+        self.condition = rng.integers(0, 5, n)
+        self.signal = rng.integers(0, 2, n).astype(bool)
+        correct = rng.random(n) < c + (1 - c) / (1 + np.exp(-alpha * x[self.condition]))
+        self.response = np.where(correct, self.signal, ~self.signal)
+        self.experiment = Experiment()
+        for _ in range(5):
+            self.experiment.add_condition(SignalDetection(0, 0, 0, 0))
+        self.experiment.record_trials(self.condition, self.signal, self.response)
+
+    def test_trials_match_fit(self):
+        reference = SimplifiedThreePL(self.experiment).fit()
+        model = OnlineThreePL()
+        for batch in np.array_split(np.arange(len(self.condition)), 50):
+            result = model.partial_fit_trials(self.condition[batch], self.signal[batch], self.response[batch])
+        self.assertTrue(result["converged"])
+        self.assertEqual(result["n_trials"], len(self.condition))
+        self.assertEqual(model.n_batches, 50)
+        self.assertAlmostEqual(result["discrimination"], reference.x[0], places=4)
+        self.assertAlmostEqual(result["logit_base_rate"], reference.x[1], places=4)
+        self.assertAlmostEqual(result["negative_log_likelihood"], reference.fun, places=4)
+
+    def test_count_batches(self):
+        # Streaming the same data as per-condition count batches (or Experiments) gives the same estimate
+        counts = self.experiment.counts
+        by_trials = OnlineThreePL()
+        by_trials.partial_fit_trials(self.condition, self.signal, self.response)
+        by_counts = OnlineThreePL()
+        by_counts.partial_fit(counts / 2)
+        by_counts.partial_fit(Experiment.from_counts(counts / 4))
+        result = by_counts.partial_fit(counts / 4)
+        self.assertAlmostEqual(result["discrimination"], by_trials.get_discrimination(), places=6)
+        self.assertAlmostEqual(result["base_rate"], by_trials.get_base_rate(), places=6)
+        # Only the running per-condition sums are kept
+        self.assertEqual(by_counts._n_total.shape, (5,))
+
+    def test_uninformative_data(self):
+        # Data with no difficulty effect, some of it below chance: the estimate is fit()'s,
+        # including its flat alpha = 0 model
+        counts = np.random.default_rng(3).integers(0, 60, (20, 5, 4)).astype(float)
+        below_chance = [[38, 48, 46, 48], [16, 54, 1, 29], [25, 36, 38, 33], [3, 11, 31, 30], [12, 55, 9, 54]]
+        for rows in np.concatenate([counts, [below_chance]]):
+            model = SimplifiedThreePL(Experiment.from_counts(rows))
+            reference = model.fit()
+            online = OnlineThreePL()
+            online.partial_fit(rows / 2)
+            result = online.partial_fit(rows / 2)
+            self.assertTrue(result["converged"])
+            nll = model.negative_log_likelihood([result["discrimination"], result["logit_base_rate"]])
+            self.assertAlmostEqual(nll, result["negative_log_likelihood"], places=6)
+            self.assertLessEqual(nll, reference.fun + 1e-6)
+            # logit c is unidentified as c -> 0, so compare c itself
+            self.assertAlmostEqual(result["discrimination"], reference.x[0], places=3)
+            self.assertAlmostEqual(result["base_rate"], expit(reference.x[1]), places=4)
+
+    def test_invalid_batches(self):
+        model = OnlineThreePL()
+        self.assertIsNone(model.partial_fit(np.zeros((5, 4)))["negative_log_likelihood"])
+        with self.assertRaises(ValueError):
+            model.partial_fit([[1, 2, 3]])
+        with self.assertRaises(ValueError):
+            model.partial_fit([[1, 2, 3, -1]])
+        with self.assertRaises(ValueError):
+            model.partial_fit_trials([5], [True], [True])
+        with self.assertRaises(ValueError):
+            model.partial_fit_trials([0, 1], [True], [True])
+
+if __name__ == "__main__":
+    unittest.main()
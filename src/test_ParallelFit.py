@@ -0,0 +1,51 @@
+#testing script for ParallelFit
+import unittest
+import numpy as np
+from src.SignalDetection import SignalDetection
+from src.Experiment import Experiment
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.ParallelFit import fit_parallel
+
+class TestParallelFit(unittest.TestCase):
+
+    def setUp(self):
+        self.experiments = []
+        for shift in range(6):
+            experiment = Experiment()
+            for hits in [55, 60, 75, 90, 95]:
+                hits = min(hits + shift, 99)
+                experiment.add_condition(SignalDetection(hits, 100 - hits, 100 - hits, hits))
+            self.experiments.append(experiment)
+
+    def test_matches_sequential_fits(self):
+        # Results come back in input order and agree with fitting one model at a time
+        result = fit_parallel(self.experiments, max_workers=2, chunksize=2)
+        self.assertTrue(np.all(result["converged"]))
+        for i, experiment in enumerate(self.experiments):
+            model = SimplifiedThreePL(experiment)
+            model.fit()
+            self.assertAlmostEqual(result["discrimination"][i], model.get_discrimination(), places=6)
+            self.assertAlmostEqual(result["base_rate"][i], model.get_base_rate(), places=6)
+
+    def test_fit_options(self):
+        # Model and fit options reach every worker's fit
+        difficulty = [1.5, 0.5, 0, -0.5, -1.5]
+        result = fit_parallel(self.experiments, max_workers=2, chunksize=3, difficulty_params=difficulty,
+                              person_param=0.5, initial_guess=[2.0, -1.0], max_starts=1)
+        self.assertTrue(np.all(result["converged"]))
+        for i, experiment in enumerate(self.experiments):
+            model = SimplifiedThreePL(experiment, difficulty_params=difficulty, person_param=0.5)
+            model.fit(initial_guess=[2.0, -1.0], max_starts=1)
+            self.assertAlmostEqual(result["discrimination"][i], model.get_discrimination(), places=6)
+            self.assertAlmostEqual(result["base_rate"][i], model.get_base_rate(), places=6)
+        default = fit_parallel(self.experiments[:1], max_workers=1)
+        self.assertNotAlmostEqual(result["discrimination"][0], default["discrimination"][0], places=3)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            fit_parallel(np.zeros((2, 5)))
+        with self.assertRaises(ValueError):
+            fit_parallel(np.zeros((2, 5, 4)), chunksize=0)
+
+if __name__ == '__main__':
+    unittest.main()
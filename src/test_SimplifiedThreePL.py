@@ -1,11 +1,13 @@
 #testing script for SimplifiedThreePL
 #initial code from ChatGPT, then continued to prompt ChatGPT with errors to fix code
 import unittest
+import unittest.mock
 import numpy as np
 from scipy.special import expit
 from src.SignalDetection import SignalDetection
 from src.Experiment import Experiment
-from src.SimplifiedThreePL import SimplifiedThreePL
+from src.SimplifiedThreePL import SimplifiedThreePL, FitCache
+from src.BatchThreePL import fit_batch
 
 class TestSimplifiedThreePL(unittest.TestCase):
 
@@ -182,6 +184,264 @@ class TestSimplifiedThreePL(unittest.TestCase):
         with self.assertRaises(ValueError):
             unfit_model.get_base_rate()
 
+    def test_gradient_and_hessian(self):
+        # Compare the analytic derivatives against central finite differences
+        eps = 1e-6
+        for params in [np.array([1.0, 0.0]), np.array([0.3, -1.2]), np.array([2.5, 0.7])]:
+            gradient = self.model.gradient(params)
+            hessian = self.model.hessian(params)
+            for i in range(2):
+                step = np.zeros(2)
+                step[i] = eps
+                numeric = (self.model.negative_log_likelihood(params + step)
+                           - self.model.negative_log_likelihood(params - step)) / (2 * eps)
+                self.assertAlmostEqual(gradient[i], numeric, places=3)
+                numeric_row = (self.model.gradient(params + step) - self.model.gradient(params - step)) / (2 * eps)
+                np.testing.assert_allclose(hessian[i], numeric_row, rtol=1e-4, atol=1e-4)
+
+    def test_streaming_refit(self):
+        # Trials recorded after construction are picked up and the refit can warm-start
+        self.model.fit()
+        before = self.model.summary()
+        rng = np.random.default_rng(0)
+        conditions = rng.integers(0, 5, 1000)
+        signal_present = rng.random(1000) < 0.5
+        response = np.where(signal_present, rng.random(1000) < 0.8, rng.random(1000) < 0.2)
+        self.experiment.record_trials(conditions, signal_present, response)
+        after = self.model.summary()
+        self.assertEqual(after["n_total"], before["n_total"] + 1000)
+
+        warm = self.model.fit(warm_start=True)
+        fresh = SimplifiedThreePL(self.experiment).fit()
+        np.testing.assert_allclose(warm.x, fresh.x, atol=1e-3)
+
+    def test_fit_cache(self):
+        # Models with identical counts share one optimizer run through the cache
+        cache = FitCache(maxsize=2)
+        first = SimplifiedThreePL(self.experiment, cache=cache).fit()
+        second_model = SimplifiedThreePL(self.experiment, cache=cache)
+        second = second_model.fit()
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertAlmostEqual(second_model.get_discrimination(), first.x[0])
+
+        # Changing the item parameters changes the key; the oldest entry is evicted past maxsize
+        for difficulty in ([4, 3, 2, 1, 0], [1, 0, -1, -2, -3]):
+            model = SimplifiedThreePL(self.experiment, cache=cache)
+            model._difficulty_params = np.array(difficulty)
+            self.assertIsNot(model.fit(), first)
+        self.assertEqual(len(cache), 2)
+        with self.assertRaises(ValueError):
+            FitCache(maxsize=0)
+
+    def test_initial_guess(self):
+        # A user-supplied or warm start lands on the same estimate as the default start
+        default = self.model.fit()
+        guessed = SimplifiedThreePL(self.experiment).fit(initial_guess=[2.0, -1.0])
+        np.testing.assert_allclose(guessed.x, default.x, atol=1e-3)
+        self.model.set_discrimination(1.1)
+        warm = self.model.fit(warm_start=True)
+        np.testing.assert_allclose(warm.x, default.x, atol=1e-3)
+
+    def test_observer(self):
+        # The observer sees one record per iteration and predict() no longer writes to stdout
+        records = []
+        model = SimplifiedThreePL(self.experiment, observer=records.append)
+        result = model.fit()
+        self.assertEqual(len(records), result.nit)
+        self.assertEqual([r["iteration"] for r in records], list(range(1, result.nit + 1)))
+        self.assertTrue(all(r["n_evaluations"] >= r["iteration"] for r in records))
+        np.testing.assert_allclose(records[-1]["parameters"], result.x)
+        self.assertAlmostEqual(records[-1]["nll"], result.fun)
+        self.assertTrue(all(r["elapsed"] >= 0 and r["gradient_norm"] >= 0 for r in records))
+        self.assertEqual({r["start"] for r in records}, {0})
+
+        # Every start of a multi-start fit numbers its iterations from 1
+        records = []
+        result = SimplifiedThreePL(self.experiment, observer=records.append).fit(initial_guess=[3.0, 12.0])
+        self.assertEqual(result.n_starts, 2)
+        self.assertEqual({r["start"] for r in records}, {0, 1})
+        best = [r for r in records if r["start"] == result.start]
+        self.assertEqual([r["iteration"] for r in best], list(range(1, result.nit + 1)))
+        self.assertAlmostEqual(best[-1]["nll"], result.fun)
+        self.assertEqual(records[0]["iteration"], 1)
+        self.assertTrue(np.all(np.diff([r["elapsed"] for r in best]) >= 0))
+
+        with self.assertLogs("src.SimplifiedThreePL", level="DEBUG") as logs:
+            SimplifiedThreePL(self.experiment).fit()
+        self.assertTrue(any("fit iteration 1" in line for line in logs.output))
+
+        with unittest.mock.patch("builtins.print") as mock_print:
+            self.model.predict([1.0, 0.0])
+        mock_print.assert_not_called()
+
+    def test_bootstrap(self):
+        # Intervals bracket the point estimate and are reproducible across worker counts
+        self.model.fit()
+        intervals = self.model.bootstrap(n_resamples=500, seed=42)
+        low, high = intervals["discrimination"]
+        self.assertLess(low, self.model.get_discrimination())
+        self.assertGreater(high, self.model.get_discrimination())
+        low, high = intervals["base_rate"]
+        self.assertTrue(0 < low < self.model.get_base_rate() < high < 1)
+        np.testing.assert_allclose(expit(intervals["logit_base_rate"]), intervals["base_rate"], rtol=1e-4)
+        self.assertEqual(intervals["n_converged"], 500)
+
+        parallel = self.model.bootstrap(n_resamples=500, seed=42, n_jobs=2)
+        for name in ("discrimination", "base_rate", "logit_base_rate"):
+            np.testing.assert_array_equal(parallel[name], intervals[name])
+
+        bca = self.model.bootstrap(n_resamples=500, seed=42, method="bca")
+        self.assertLess(bca["discrimination"][0], bca["discrimination"][1])
+        with self.assertRaises(ValueError):
+            self.model.bootstrap(method="normal")
+
+    def test_weighted_bootstrap(self):
+        # Intervals are built around the weighted estimate and match an experiment with the counts repeated
+        weights = [10, 1, 1, 1, 10]
+        weighted = Experiment.from_counts(self.experiment.counts, weights=weights)
+        repeated = Experiment.from_counts(self.experiment.counts * np.array(weights)[:, None])
+        weighted_model = SimplifiedThreePL(weighted)
+        weighted_model.fit()
+        intervals = weighted_model.bootstrap(n_resamples=300, seed=7)
+        reference = SimplifiedThreePL(repeated).bootstrap(n_resamples=300, seed=7)
+        for name in ("discrimination", "base_rate", "logit_base_rate"):
+            np.testing.assert_allclose(intervals[name], reference[name])
+        low, high = intervals["discrimination"]
+        self.assertLess(low, weighted_model.get_discrimination())
+        self.assertGreater(high, weighted_model.get_discrimination())
+        unweighted = self.model.bootstrap(n_resamples=300, seed=7)
+        self.assertLess(np.diff(intervals["discrimination"])[0], np.diff(unweighted["discrimination"])[0])
+
+    def test_bootstrap_flat_estimate(self):
+        # Below chance the fit is the flat alpha = 0 model; the BCa intervals are centred on it
+        counts = np.array([[38, 48, 46, 48], [16, 54, 1, 29], [25, 36, 38, 33], [3, 11, 31, 30], [12, 55, 9, 54]])
+        model = SimplifiedThreePL(Experiment.from_counts(counts))
+        model.fit()
+        intervals = model.bootstrap(n_resamples=300, seed=1, method="bca")
+        low, high = intervals["discrimination"]
+        self.assertTrue(low <= model.get_discrimination() <= high)
+        low, high = intervals["logit_base_rate"]
+        self.assertTrue(low < model.get_logit_base_rate() < high)
+        low, high = intervals["base_rate"]
+        self.assertTrue(low < model.get_base_rate() < high)
+
+    def test_log_space_likelihood(self):
+        # Probabilities that round to 0 or 1 still give finite likelihoods and gradients
+        for params in ([40.0, 0.0], [1.0, 40.0], [1.0, -800.0]):
+            self.assertTrue(np.isfinite(self.model.negative_log_likelihood(params)))
+            self.assertTrue(np.all(np.isfinite(self.model.gradient(params))))
+            with np.errstate(divide="raise", invalid="raise"):
+                self.assertTrue(np.all(np.isfinite(self.model.hessian(params))))
+        # Away from the extremes it matches the direct formula
+        p = self.model.predict([1.5, -0.5])
+        n_correct = np.array([110, 120, 150, 180, 190])
+        expected = -np.sum(n_correct * np.log(p) + (200 - n_correct) * np.log(1 - p))
+        self.assertAlmostEqual(self.model.negative_log_likelihood([1.5, -0.5]), expected, places=8)
+
+        reference = SimplifiedThreePL(self.experiment).fit()
+        extreme = self.model.fit(initial_guess=[20.0, 0.0])
+        self.assertEqual(extreme.n_starts, 1)
+        np.testing.assert_allclose(extreme.x, reference.x, atol=1e-3)
+
+    def test_likelihood_grid_and_profiles(self):
+        alphas = np.array([0.0, 0.5, 1.2, 3.0])
+        qs = np.array([-2.0, 0.0, 1.5])
+        surface = self.model.negative_log_likelihood_grid(alphas, qs)
+        self.assertEqual(surface.shape, (4, 3))
+        for i, alpha in enumerate(alphas):
+            for j, q in enumerate(qs):
+                self.assertAlmostEqual(surface[i, j], self.model.negative_log_likelihood([alpha, q]), places=10)
+        # Arrays of parameter pairs broadcast like NumPy arrays
+        pairs = self.model.negative_log_likelihood((alphas, np.full(4, 0.0)))
+        np.testing.assert_allclose(pairs, surface[:, 1])
+
+        result = self.model.fit()
+        values = np.linspace(0.2, 3.0, 15)
+        profile = self.model.profile_likelihood("discrimination", values)
+        self.assertTrue(np.all(profile["converged"]))
+        np.testing.assert_array_equal(profile["discrimination"], values)
+        np.testing.assert_allclose(profile["negative_log_likelihood"],
+                                   self.model.negative_log_likelihood((values, profile["logit_base_rate"])))
+        # No slice beats the joint optimum, and each is the minimum over a fine grid of q
+        self.assertTrue(np.all(profile["deviance"] >= -1e-8))
+        grid = self.model.negative_log_likelihood_grid(values, np.linspace(-3, 3, 3001))
+        np.testing.assert_allclose(profile["negative_log_likelihood"], grid.min(axis=1), atol=1e-4)
+
+        profile = self.model.profile_likelihood("logit_base_rate", [result.x[1], -1.0, 1.0])
+        self.assertAlmostEqual(profile["negative_log_likelihood"][0], result.fun, places=5)
+        self.assertAlmostEqual(profile["discrimination"][0], result.x[0], places=3)
+        with self.assertRaises(ValueError):
+            self.model.profile_likelihood("difficulty", [0.0])
+        with self.assertRaises(ValueError):
+            self.model.profile_likelihood("discrimination", [-1.0])
+
+    def test_multi_start(self):
+        # A start the optimizer cannot use falls through to the next starting point
+        with np.errstate(invalid="ignore"):
+            result = self.model.fit(initial_guess=[np.nan, 0.0])
+            self.assertEqual(result.n_starts, 2)
+            self.assertTrue(self.model.is_fitted())
+            with self.assertRaises(ValueError):
+                SimplifiedThreePL(self.experiment).fit(initial_guess=[np.nan, 0.0], max_starts=1)
+
+        # A start far out on the flat tail no longer stalls on the alpha = 0 jump
+        reference = SimplifiedThreePL(self.experiment).fit()
+        result = self.model.fit(initial_guess=[40.0, 0.0])
+        self.assertEqual(result.n_starts, 1)
+        self.assertAlmostEqual(result.fun, reference.fun, places=5)
+        # Above chance the flat model is a limit of the smooth branch, so a smooth optimum it
+        # beats is a local one and the search goes on
+        result = self.model.fit(initial_guess=[3.0, 12.0])
+        self.assertEqual(result.n_starts, 2)
+        self.assertAlmostEqual(result.fun, reference.fun, places=5)
+
+        # Below-chance accuracy: only predict()'s flat alpha = 0 model reaches it, and one start suffices
+        counts = np.array([[38, 48, 46, 48], [16, 54, 1, 29], [25, 36, 38, 33], [3, 11, 31, 30], [12, 55, 9, 54]])
+        result = SimplifiedThreePL(Experiment.from_counts(counts)).fit()
+        self.assertEqual(result.n_starts, 1)
+        self.assertEqual(result.x[0], 0.0)
+        self.assertAlmostEqual(expit(result.x[1]), (counts[:, 0] + counts[:, 3]).sum() / counts.sum())
+        self.assertLessEqual(result.fun, fit_batch(counts[None])["negative_log_likelihood"][0] + 1e-6)
+        for rows in np.random.default_rng(3).integers(0, 60, (40, 5, 4)).astype(float):
+            result = SimplifiedThreePL(Experiment.from_counts(rows)).fit()
+            batch = fit_batch(rows[None])["negative_log_likelihood"][0]
+            self.assertLessEqual(result.fun, batch + 1e-6 * batch)
+
+    def test_weighted_conditions(self):
+        # A row with weight w contributes like its counts multiplied by w
+        weighted = Experiment()
+        scaled = Experiment()
+        for i, sdt in enumerate(self.experiment.conditions):
+            weighted.add_condition(sdt, weight=i + 1)
+            scaled.add_condition(SignalDetection(sdt.hits * (i + 1), sdt.misses * (i + 1),
+                                                 sdt.falseAlarms * (i + 1), sdt.correctRejections * (i + 1)))
+        weighted_model = SimplifiedThreePL(weighted)
+        scaled_model = SimplifiedThreePL(scaled)
+        self.assertAlmostEqual(weighted_model.negative_log_likelihood([1.2, 0.3]),
+                               scaled_model.negative_log_likelihood([1.2, 0.3]))
+        np.testing.assert_allclose(weighted_model.fit().x, scaled_model.fit().x)
+        # Collapsing duplicated sessions of the same design cells leaves the likelihood unchanged
+        sessions = Experiment()
+        for _ in range(3):
+            for cell, sdt in enumerate(self.experiment.conditions):
+                sessions.add_condition(sdt, f"Condition {cell + 1}", cell=cell)
+        sessions.add_condition(self.experiment.conditions[0], "Condition 1", cell=0)
+        collapsed = sessions.collapse_duplicates()
+        self.assertEqual(len(collapsed.counts), 5)
+        for params in ([1.0, 0.0], [1.2, 0.3], [0.0, -1.0]):
+            self.assertAlmostEqual(SimplifiedThreePL(collapsed).negative_log_likelihood(params),
+                                   SimplifiedThreePL(sessions).negative_log_likelihood(params))
+        alternating = Experiment()
+        for i in range(5):
+            alternating.add_condition(self.experiment.conditions[i % 2])
+        self.assertAlmostEqual(SimplifiedThreePL(alternating.collapse_duplicates()).negative_log_likelihood([1, 0]),
+                               SimplifiedThreePL(alternating).negative_log_likelihood([1, 0]))
+
+        summary = weighted_model.summary()
+        self.assertEqual(summary["n_total"], 200 * 15)
+        self.assertEqual(summary["n_conditions"], 15)
+
     def test_multiple_fits(self):
         # Test that parameters remain approximately stable when fitting multiple times
         self.model.fit()
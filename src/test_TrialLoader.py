@@ -0,0 +1,86 @@
+#testing script for TrialLoader
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from src.Experiment import Experiment
+from src.SignalDetection import SignalDetection
+from src.SimplifiedThreePL import SimplifiedThreePL
+from src.TrialLoader import TrialCounter, load_trials, load_experiments, counts_to_experiments
+
+class TestTrialLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        n = 5000
+        self.trials = np.column_stack([rng.integers(0, 7, n), rng.integers(0, 5, n),
+                                       rng.integers(0, 2, n), rng.integers(0, 2, n)])
+        # Reference counts built one trial at a time through Experiment.record_trials
+        self.expected = np.zeros((7, 5, 4))
+        for participant in range(7):
+            experiment = Experiment()
+            for _ in range(5):
+                experiment.add_condition(SignalDetection(0, 0, 0, 0))
+            rows = self.trials[self.trials[:, 0] == participant]
+            experiment.record_trials(rows[:, 1], rows[:, 2], rows[:, 3])
+            self.expected[participant] = experiment.counts
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_counter_matches_record_trials(self):
+        counter = TrialCounter()
+        for block in np.array_split(self.trials, 7):
+            counter.update(*block.T)
+        np.testing.assert_array_equal(counter.counts, self.expected)
+        self.assertEqual(counter.n_trials, len(self.trials))
+        # A single trial uses the sparse path; boolean columns are accepted
+        counter.update(np.array([0]), np.array([0]), np.array([True]), np.array([False]))
+        self.assertEqual(counter.counts[0, 0, 1], self.expected[0, 0, 1] + 1)
+
+    def test_csv_and_npy(self):
+        csv_path = os.path.join(self.directory, "trials.csv")
+        with open(csv_path, "w") as f:
+            f.write("response,participant,signal,condition\n")
+            for participant, condition, signal, response in self.trials.tolist():
+                f.write(f"{response},{participant},{signal},{condition}\n")
+        np.testing.assert_array_equal(load_trials(csv_path, chunk_size=333), self.expected)
+
+        npy_path = os.path.join(self.directory, "trials.npy")
+        np.save(npy_path, self.trials)
+        np.testing.assert_array_equal(load_trials(npy_path, chunk_size=1000), self.expected)
+
+        structured = np.zeros(len(self.trials), dtype=[("participant", "i4"), ("condition", "i4"),
+                                                        ("signal", "?"), ("response", "?")])
+        for i, name in enumerate(structured.dtype.names):
+            structured[name] = self.trials[:, i]
+        np.save(npy_path, structured)
+        np.testing.assert_array_equal(load_trials(npy_path), self.expected)
+
+        experiments = load_experiments(npy_path)
+        self.assertEqual(len(experiments), 7)
+        np.testing.assert_array_equal(experiments[3].counts, self.expected[3])
+        model = SimplifiedThreePL(experiments[3])
+        self.assertAlmostEqual(model.negative_log_likelihood([1.0, 0.0]),
+                               SimplifiedThreePL(counts_to_experiments(self.expected)[3])
+                               .negative_log_likelihood([1.0, 0.0]))
+
+    def test_invalid_trials(self):
+        counter = TrialCounter(n_participants=2, n_conditions=5)
+        with self.assertRaises(ValueError):
+            counter.update([2], [0], [1], [1])
+        with self.assertRaises(ValueError):
+            counter.update([0], [-1], [1], [1])
+        with self.assertRaises(ValueError):
+            counter.update([0], [0], [2], [1])
+        with self.assertRaises(ValueError):
+            counter.update([0.5], [0], [1], [1])
+        with self.assertRaises(ValueError):
+            counter.update([0, 1], [0], [1], [1])
+        self.assertEqual(counter.counts.shape, (2, 5, 4))
+        self.assertEqual(counter.counts.sum(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 #new
 #code generated from ChatGPT, still work in progress
 import unittest
+import numpy as np
 from src.Experiment import Experiment
 from src.SignalDetection import SignalDetection
 
@@ -73,7 +74,161 @@ class TestExperiment(unittest.TestCase):
         self.exp.add_condition(sdt)
         self.assertEqual(len(self.exp.conditions), 1)
         self.assertIsNone(self.exp.labels[0])
-        
+
+    def test_columnar_storage(self):
+        # Add more conditions than the initial capacity and read them back through every view
+        for i in range(20):
+            self.exp.add_condition(SignalDetection(i, 10, 5, i + 1), "Odd" if i % 2 else "Even")
+        self.assertEqual(len(self.exp.conditions), 20)
+        self.assertEqual(self.exp.counts.shape, (20, 4))
+        self.assertEqual(list(self.exp.counts[7]), [7, 10, 5, 8])
+        self.assertEqual(self.exp.conditions[-1].hits, 19)
+        # Whole counts come back as the ints that were passed in
+        self.assertEqual(repr(self.exp.conditions[-1].hits), "19")
+        self.assertEqual([sdt.correctRejections for sdt in self.exp.conditions][:3], [1, 2, 3])
+        self.assertEqual(list(self.exp.labels[:3]), ["Even", "Odd", "Even"])
+        self.assertEqual(len(self.exp._label_values), 2)
+        with self.assertRaises(ValueError):
+            self.exp.counts[0, 0] = 100
+        with self.assertRaises(IndexError):
+            self.exp.conditions[20]
+        self.exp.add_condition(SignalDetection(2.5, 1, 1, 1))
+        self.assertEqual(self.exp.conditions[20].hits, 2.5)
+
+    def test_signal_detection_metrics(self):
+        # Vectorized metrics should agree with the per-object SignalDetection methods
+        conditions = [SignalDetection(80, 20, 30, 70), SignalDetection(100, 0, 0, 100),
+                      SignalDetection(0, 0, 5, 5), SignalDetection(12.5, 7.5, 3, 17)]
+        for sdt in conditions:
+            self.exp.add_condition(sdt)
+        metrics = self.exp.signal_detection_metrics()
+        for i, sdt in enumerate(conditions):
+            self.assertAlmostEqual(metrics["hit_rate"][i], sdt.hit_rate())
+            self.assertAlmostEqual(metrics["false_alarm_rate"][i], sdt.false_alarm_rate())
+            self.assertAlmostEqual(metrics["d_prime"][i], sdt.d_prime())
+            self.assertAlmostEqual(metrics["criterion"][i], sdt.criterion())
+        np.testing.assert_allclose(metrics["beta"], np.exp(metrics["d_prime"] * metrics["criterion"]))
+
+        # Clamping bounds are configurable
+        wide = self.exp.signal_detection_metrics(lower=0.001, upper=0.999)
+        self.assertGreater(wide["d_prime"][1], metrics["d_prime"][1])
+        with self.assertRaises(ValueError):
+            self.exp.signal_detection_metrics(lower=0.0)
+
+    def test_record_trials(self):
+        self.exp.add_condition(SignalDetection(0, 0, 0, 0), "A")
+        self.exp.add_condition(SignalDetection(1, 1, 1, 1), "B")
+        # A single trial: signal present, "yes" response is a hit
+        self.exp.record_trials(0, True, True)
+        # A chunk of trials covering every outcome
+        self.exp.record_trials([1, 1, 1, 1, 0], [True, True, False, False, False], [True, False, True, False, True])
+        np.testing.assert_array_equal(self.exp.counts, [[1, 0, 1, 0], [2, 2, 2, 2]])
+        np.testing.assert_array_equal(self.exp.totals, [3, 2, 3, 2])
+        self.assertEqual(self.exp.conditions[1].falseAlarms, 2)
+        self.assertAlmostEqual(self.exp.compute_auc(), 0.5)
+
+        version = self.exp.version
+        self.exp.record_trials([], [], [])
+        self.assertEqual(self.exp.version, version)
+        with self.assertRaises(ValueError):
+            self.exp.record_trials(2, True, True)
+        with self.assertRaises(ValueError):
+            self.exp.record_trials([0, 1], [True], [True])
+
+    def test_auc_cache(self):
+        rng = np.random.default_rng(0)
+        for hits, false_alarms in rng.integers(0, 101, (200, 2)):
+            self.exp.add_condition(SignalDetection(int(hits), 100 - int(hits), int(false_alarms), 100 - int(false_alarms)))
+        # Reference trapezoid sum over the sorted points with the implicit endpoints
+        far, hr = self.exp.sorted_roc_points()
+        self.assertEqual(sorted(zip(far, hr)), list(zip(far, hr)))
+        far, hr = [0.0] + far + [1.0], [0.0] + hr + [1.0]
+        expected = sum((far[i + 1] - far[i]) * (hr[i] + hr[i + 1]) / 2 for i in range(len(far) - 1))
+        self.assertAlmostEqual(self.exp.compute_auc(), expected)
+        self.assertEqual(self.exp.compute_auc(), self.exp.compute_auc())
+
+        # Adding a condition or recording trials invalidates the cached curve
+        self.exp.add_condition(SignalDetection(100, 0, 0, 100))
+        self.assertEqual(len(self.exp.sorted_roc_points()[0]), 201)
+        auc = self.exp.compute_auc()
+        self.assertGreater(auc, expected)
+        self.exp.record_trials([200] * 50, [False] * 50, [True] * 50)
+        self.assertNotAlmostEqual(self.exp.compute_auc(), auc)
+
+    def test_weights_and_duplicates(self):
+        # Repeated sessions of design cells 0 and 1; only rows of the same cell are merged
+        rows = [(40, 10, 20, 30), (30, 20, 20, 30), (40, 10, 20, 30), (40, 10, 20, 30), (0, 0, 0, 0)]
+        for row, cell in zip(rows, [0, 1, 0, 1, 2]):
+            self.exp.add_condition(SignalDetection(*row), "Same", cell=cell)
+        collapsed = self.exp.collapse_duplicates()
+        np.testing.assert_array_equal(collapsed.counts,
+                                      [[40, 10, 20, 30], [30, 20, 20, 30], [40, 10, 20, 30], [0, 0, 0, 0]])
+        np.testing.assert_array_equal(collapsed.weights, [2, 1, 1, 1])
+        np.testing.assert_array_equal(collapsed.cells, [0, 1, 1, 2])
+        np.testing.assert_array_equal(collapsed.totals, self.exp.totals)
+        np.testing.assert_array_equal(collapsed.cell_counts(), self.exp.cell_counts())
+        self.assertEqual(list(collapsed.labels), ["Same"] * 4)
+        self.assertAlmostEqual(collapsed.compute_auc(), self.exp.compute_auc())
+
+        # By default every row is its own design cell, so nothing that the model pairs with a
+        # different difficulty is merged
+        alternating = Experiment()
+        for i in range(5):
+            alternating.add_condition(SignalDetection(*rows[i % 2]), "A" if i % 2 == 0 else "B")
+        self.assertEqual(len(alternating.collapse_duplicates().counts), 5)
+
+        # Zero-trial conditions have no operating point instead of sitting at (0.5, 0.5)
+        far, hr = self.exp.sorted_roc_points()
+        self.assertEqual(len(far), 4)
+        self.assertNotIn(0.5, far)
+        empty = Experiment()
+        empty.add_condition(SignalDetection(0, 0, 0, 0))
+        with self.assertRaises(ValueError):
+            empty.compute_auc()
+
+        weighted = Experiment()
+        weighted.add_condition(SignalDetection(1, 2, 3, 4), weight=2.5)
+        weighted.record_trials(0, True, True)
+        np.testing.assert_array_equal(weighted.totals, [5, 5, 7.5, 10])
+        with self.assertRaises(ValueError):
+            weighted.add_condition(SignalDetection(1, 2, 3, 4), weight=-1)
+
+    def test_from_counts(self):
+        counts = np.array([[40, 10, 20, 30], [30, 20, 20, 30], [5, 5, 5, 5]], dtype=np.int32)
+        for i, row in enumerate(counts):
+            self.exp.add_condition(SignalDetection(*row), ["A", None, "A"][i], weight=i + 1)
+        built = Experiment.from_counts(counts, labels=["A", None, "A"], weights=[1, 2, 3])
+        np.testing.assert_array_equal(built.counts, self.exp.counts)
+        np.testing.assert_array_equal(built.totals, self.exp.totals)
+        self.assertEqual(list(built.labels), list(self.exp.labels))
+        self.assertAlmostEqual(built.compute_auc(), self.exp.compute_auc())
+        # The experiment owns its data and can keep growing
+        counts[0, 0] = 0
+        built.add_condition(SignalDetection(1, 1, 1, 1), "B")
+        self.assertEqual(built.conditions[0].hits, 40)
+        self.assertEqual(list(built.labels), ["A", None, "A", "B"])
+
+        sdts = SignalDetection.from_arrays(counts[:, 0], counts[:, 1], counts[:, 2], counts[:, 3])
+        self.assertEqual([sdt.d_prime() for sdt in sdts],
+                         [SignalDetection(*row.tolist()).d_prime() for row in counts])
+        self.assertEqual([type(sdt.hits) for sdt in sdts], [int] * 3)
+        self.assertEqual(SignalDetection.from_arrays([0.5], [1], [1], [1])[0].hits, 0.5)
+        self.assertEqual(SignalDetection(np.int64(3), np.float32(1), 0, 2).hits, 3)
+
+        for bad in ([[1, 2, 3, -1]], [[1, 2, 3, np.nan]], [[1, 2, 3]], [["1", "2", "3", "4"]]):
+            with self.assertRaises(ValueError):
+                Experiment.from_counts(np.array(bad))
+        with self.assertRaises(ValueError):
+            SignalDetection.from_arrays([1, 2], [1, 2], [1, np.inf], [1, 2])
+        with self.assertRaises(ValueError):
+            Experiment.from_counts(counts, weights=[1, -1, 1])
+        with self.assertRaises(ValueError):
+            Experiment.from_counts(counts, cells=[0, -1, 1])
+        np.testing.assert_array_equal(Experiment.from_counts(counts, cells=[0, 0, 1]).cell_counts(),
+                                      [counts[0] + counts[1], counts[2]])
+        with self.assertRaises(ValueError):
+            SignalDetection(np.float64(np.inf), 1, 1, 1)
+
 if __name__ == "__main__":
     unittest.main()
 
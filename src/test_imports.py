@@ -0,0 +1,32 @@
+#startup budget for the src package
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous wall-clock budget for a fresh interpreter importing the package (numpy alone is ~0.1 s)
+IMPORT_BUDGET_SECONDS = 1.0
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import src.SignalDetection, src.Experiment, src.SimplifiedThreePL
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(sorted(name for name in sys.modules if name == "scipy" or name.startswith("scipy."))))
+"""
+
+class TestImports(unittest.TestCase):
+
+    def test_import_does_not_load_scipy(self):
+        # Counting and AUC must not pay for SciPy; it is loaded on first fit/ppf instead
+        output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=REPO_ROOT, check=True,
+                                capture_output=True, text=True).stdout.splitlines()
+        elapsed, scipy_modules = float(output[0]), output[1] if len(output) > 1 else ""
+        self.assertEqual(scipy_modules, "")
+        self.assertLess(elapsed, IMPORT_BUDGET_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()